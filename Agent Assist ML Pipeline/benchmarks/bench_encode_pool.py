@@ -0,0 +1,73 @@
+"""
+Encoding throughput (rows/sec) of the labeler's model from 1 to N worker processes.
+
+Run from the "Agent Assist ML Pipeline" folder:
+    python -m benchmarks.bench_encode_pool
+    python -m benchmarks.bench_encode_pool --workers 1 2 4 8 16 32 --rows 20000 --chunk-size 500
+"""
+import argparse
+import os
+import time
+
+from benchmarks.bench_noise_removal import synthetic_summaries
+from src.data.data_store import LABELED_STORE_PATH, read_table, table_exists
+from src.models.encode_pool import EncodePool
+from src.models.model_registry import get_model
+
+
+def load_texts(path, n_rows):
+    if path is None and table_exists(LABELED_STORE_PATH):
+        path = LABELED_STORE_PATH
+    if path is None:
+        print(f"No labeled data found, using {n_rows} synthetic summaries")
+        return synthetic_summaries(n_rows).tolist()
+    print(f"Reading Knowledge_Answer from {path}")
+    texts = read_table(path, columns=["Knowledge_Answer"])["Knowledge_Answer"].dropna().tolist()
+    return texts[:n_rows]
+
+
+def default_worker_counts():
+    counts, n = [], 1
+    while n < (os.cpu_count() or 1):
+        counts.append(n)
+        n *= 2
+    return counts + [os.cpu_count() or 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", default=None, help="store directory or CSV with a Knowledge_Answer column")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--model", default="all-mpnet-base-v2")
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--workers", type=int, nargs="+", default=None, help="worker counts to try (default 1, 2, 4, ... cpus)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    texts = load_texts(args.input, args.rows)
+    worker_counts = args.workers or default_worker_counts()
+
+    model = get_model(args.model, "cpu", args.backend)
+    model.encode(texts[:args.batch_size], batch_size=args.batch_size, show_progress_bar=False)  # warm up
+    start = time.perf_counter()
+    model.encode(texts, batch_size=args.batch_size, show_progress_bar=False)
+    in_process = len(texts) / (time.perf_counter() - start)
+
+    results = []
+    for workers in worker_counts:
+        with EncodePool(args.model, args.backend, workers=workers, chunk_size=args.chunk_size,
+                        batch_size=args.batch_size) as pool:
+            pool.warm_up()  # model loading isn't part of the throughput
+            start = time.perf_counter()
+            pool.encode(texts)
+            results.append((workers, len(texts) / (time.perf_counter() - start)))
+
+    print(f"\n=== Encode Throughput: {args.model} ({args.backend}), {len(texts)} rows ===")
+    print(f"{'in-process':>10} : {in_process:8.1f} rows/s")
+    for workers, rows_per_sec in results:
+        print(f"{workers:>3} workers : {rows_per_sec:8.1f} rows/s  ({rows_per_sec / in_process:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
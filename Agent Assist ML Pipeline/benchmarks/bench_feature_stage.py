@@ -0,0 +1,115 @@
+"""
+Peak memory and time of the fused feature stage (data_pipeline.engineer_features)
+against the old chain of copying steps finalize_data used to run.
+
+Each stage runs in its own interpreter so the process peaks don't mix. Arrow-backed
+text lives outside the Python heap, so the Arrow pool peak and max RSS are reported
+next to tracemalloc's number.
+
+Run from the "Agent Assist ML Pipeline" folder (needs the spaCy model):
+    python -m benchmarks.bench_feature_stage
+    python -m benchmarks.bench_feature_stage --input data/processed/cleaned_feedback --rows 20000
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+import pyarrow as pa
+
+from benchmarks.bench_noise_removal import synthetic_summaries
+from src.data.data_add import preprocess_conversation_length_dataframe, preprocess_conversation_times_dataframe
+from src.data.data_clean import filter_phrases_by_noise, shorten_summary
+from src.data.data_pipeline import engineer_features
+from src.data.data_schema import apply_schema
+from src.data.data_store import CLEANED_STORE_PATH, TIMESTAMP_FORMAT, read_table, table_exists
+
+
+def chained_features(df):
+    # what finalize_data did before engineer_features
+    df["Original_Knowledge_Answer"] = df["Knowledge_Answer"]
+    df = filter_phrases_by_noise(df)
+    df = preprocess_conversation_times_dataframe(df)
+    df = preprocess_conversation_length_dataframe(df)
+    df = shorten_summary(df, cache_path=None)
+    return df
+
+
+def fused_features(df):
+    return engineer_features(df, cache_path=None)
+
+
+def load_frame(path, n_rows):
+    if path is None and table_exists(CLEANED_STORE_PATH):
+        path = CLEANED_STORE_PATH
+    if path is None:
+        print(f"No processed data found, using {n_rows} synthetic rows")
+        timestamps = pd.date_range("2025-01-01", periods=n_rows, freq="7min").strftime(TIMESTAMP_FORMAT)
+        # raw exports carry the timestamp as a string
+        return apply_schema(pd.DataFrame({"Knowledge_Answer": synthetic_summaries(n_rows), "Timestamp": timestamps}))
+    print(f"Reading {path}")
+    df = read_table(path, columns=["Knowledge_Answer", "Timestamp"]).head(n_rows)
+    df["Timestamp"] = df["Timestamp"].dt.strftime(TIMESTAMP_FORMAT)
+    return df
+
+
+STAGES = {"chained": chained_features, "fused": fused_features}
+COMPARED_COLUMNS = ["Knowledge_Answer", "Original_Knowledge_Answer", "day_of_week", "hour_of_day", "conversation_length"]
+
+
+def measure(stage, df):
+    tracemalloc.start()
+    start = time.perf_counter()
+    out = STAGES[stage](df)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, {
+        "seconds": seconds,
+        "traced_peak": peak,
+        "arrow_peak": pa.default_memory_pool().max_memory(),
+        "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,  # KB on Linux
+    }
+
+
+def run_isolated(stage, args):
+    command = [sys.executable, "-m", "benchmarks.bench_feature_stage", "--stage", stage, "--rows", str(args.rows)]
+    if args.input:
+        command += ["--input", args.input]
+    out = subprocess.run(command, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", default=None, help="store directory or CSV with Knowledge_Answer and Timestamp")
+    parser.add_argument("--rows", type=int, default=15000)
+    parser.add_argument("--stage", choices=sorted(STAGES), default=None, help="run a single stage (used internally)")
+    args = parser.parse_args()
+
+    if args.stage:
+        _, stats = measure(args.stage, load_frame(args.input, args.rows))
+        print(json.dumps(stats))
+        return
+
+    results = {stage: run_isolated(stage, args) for stage in STAGES}
+
+    # output check in-process, on a slice
+    df = load_frame(args.input, min(args.rows, 2000))
+    chained = chained_features(df.copy())
+    fused = fused_features(df.copy())
+    same = all(chained[column].astype(str).equals(fused[column].astype(str)) for column in COMPARED_COLUMNS)
+
+    print("\n=== Feature Stage ===")
+    for stage, stats in results.items():
+        print(f"{stage:<8}: {stats['seconds']:6.2f}s | traced peak {stats['traced_peak'] / 1e6:7.1f} MB "
+              f"| arrow peak {stats['arrow_peak'] / 1e6:7.1f} MB | max RSS {stats['max_rss'] / 1e6:7.1f} MB")
+    print(f"same output on {len(df)} rows: {same}")
+
+
+if __name__ == "__main__":
+    main()
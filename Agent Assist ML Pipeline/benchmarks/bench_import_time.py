@@ -0,0 +1,76 @@
+"""
+Measures the cold start of the pipeline's entry points: each module is imported
+in a fresh interpreter, and we report the wall time and which heavy dependencies
+got pulled in along the way (they should all load lazily, on first use).
+
+Run from the "Agent Assist ML Pipeline" folder:
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --repeat 5 --budget 1.0
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+# what main.py / the dashboard import for the commands we actually run
+ENTRY_MODULES = [
+    "src.analysis.analysis_organize",       # label_sub_topics (LLM only)
+    "src.analysis.analysis_error_finding",  # find_errors_* (LLM only)
+    "src.data.data_load",
+    "src.data.data_clean",
+    "src.data.data_add",
+    "src.data.data_pipeline",
+    "main",
+]
+
+HEAVY_MODULES = ["spacy", "torch", "sentence_transformers", "openai", "matplotlib", "sklearn", "IPython"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module, repeat):
+    """
+    Best of `repeat` cold imports (in-process time, so interpreter startup isn't counted).
+    """
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            return None, out.stderr.strip().splitlines()[-1]
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    best = min(runs, key=lambda run: run["seconds"])
+    return best["seconds"], best["loaded"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3, help="cold imports per module, the best one is reported")
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds a light command may take to import")
+    args = parser.parse_args()
+
+    print("\n=== Cold Import Time ===")
+    over_budget = []
+    for module in ENTRY_MODULES:
+        seconds, loaded = measure(module, args.repeat)
+        if seconds is None:
+            print(f"{module:<40} failed: {loaded}")
+            continue
+        flag = "" if seconds < args.budget else "  <- over budget"
+        print(f"{module:<40} {seconds:6.2f}s  heavy deps loaded: {', '.join(loaded) or 'none'}{flag}")
+        if seconds >= args.budget:
+            over_budget.append(module)
+
+    print(f"\n{len(ENTRY_MODULES) - len(over_budget)}/{len(ENTRY_MODULES)} entry points import in under {args.budget:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
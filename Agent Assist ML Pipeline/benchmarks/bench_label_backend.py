@@ -0,0 +1,46 @@
+"""
+Parity check + speed of the quantized labeler backends against the fp32 model.
+Only switch LABELER_BACKEND once this passes on real data.
+
+Run from the "Agent Assist ML Pipeline" folder:
+    python -m benchmarks.bench_label_backend --backend int8
+    python -m benchmarks.bench_label_backend --backend onnx --sample 1000 --input data/processed/final_cleaned_feedback
+"""
+import argparse
+
+from benchmarks.bench_noise_removal import synthetic_summaries
+from src.data.data_add import TAXONOMIES
+from src.data.data_store import FINAL_STORE_PATH, read_table, table_exists
+from src.models.label_model import check_backend_parity
+
+
+def load_texts(path, n_rows):
+    if path is None and table_exists(FINAL_STORE_PATH):
+        path = FINAL_STORE_PATH
+    if path is None:
+        print(f"No processed data found, using {n_rows} synthetic summaries")
+        return synthetic_summaries(n_rows).tolist()
+    print(f"Reading Knowledge_Answer from {path}")
+    return read_table(path, columns=["Knowledge_Answer"])["Knowledge_Answer"].dropna().tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["int8", "onnx"], default="int8")
+    parser.add_argument("--taxonomy", choices=sorted(TAXONOMIES), default="error")
+    parser.add_argument("--input", default=None, help="store directory or CSV with a Knowledge_Answer column")
+    parser.add_argument("--sample", type=int, default=500)
+    parser.add_argument("--min-agreement", type=float, default=0.98)
+    parser.add_argument("--max-score-delta", type=float, default=0.02)
+    args = parser.parse_args()
+
+    spec = TAXONOMIES[args.taxonomy]
+    texts = load_texts(args.input, args.sample)
+    check_backend_parity(
+        texts, spec["labels"], args.backend, threshold=spec["threshold"], sample_size=args.sample,
+        min_agreement=args.min_agreement, max_score_delta=args.max_score_delta,
+    )
+
+
+if __name__ == "__main__":
+    main()
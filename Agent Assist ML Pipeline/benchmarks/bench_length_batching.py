@@ -0,0 +1,59 @@
+"""
+Padding efficiency and encode throughput of token-budget batches against fixed batches of 32.
+
+Run from the "Agent Assist ML Pipeline" folder:
+    python -m benchmarks.bench_length_batching
+    python -m benchmarks.bench_length_batching --rows 20000 --max-tokens 8192 16384 32768
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_encode_pool import load_texts
+from src.models.length_batching import (
+    encode_bucketed, fixed_batches, padding_efficiency, token_budget_batches, token_lengths,
+)
+from src.models.model_registry import get_model
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", default=None, help="store directory or CSV with a Knowledge_Answer column")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--model", default="all-mpnet-base-v2")
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-tokens", type=int, nargs="+", default=[8192, 16384, 32768])
+    args = parser.parse_args()
+
+    texts = load_texts(args.input, args.rows)
+    model = get_model(args.model, "cpu", args.backend)
+    lengths = token_lengths(model, texts)
+    print(f"{len(texts)} rows, tokens per row: median {np.median(lengths):.0f}, "
+          f"p95 {np.percentile(lengths, 95):.0f}, max {lengths.max()}")
+
+    model.encode(texts[:args.batch_size], batch_size=args.batch_size, show_progress_bar=False)  # warm up
+    start = time.perf_counter()
+    model.encode(texts, batch_size=args.batch_size, convert_to_numpy=True, show_progress_bar=False)
+    fixed_rate = len(texts) / (time.perf_counter() - start)
+
+    print(f"\n=== Length Batching: {args.model} ({args.backend}) ===")
+    print(f"{'fixed ' + str(args.batch_size) + ', arrival order':<28} : padding efficiency "
+          f"{padding_efficiency(lengths, fixed_batches(len(texts), args.batch_size)):6.1%}")
+    # SentenceTransformer.encode already sorts each call by length, this is what it actually pads
+    sorted_fixed = np.array_split(np.argsort(-lengths, kind="stable"), -(-len(texts) // args.batch_size))
+    print(f"{'fixed ' + str(args.batch_size) + ', length sorted':<28} : padding efficiency "
+          f"{padding_efficiency(lengths, sorted_fixed):6.1%} | {fixed_rate:8.1f} rows/s")
+
+    for max_tokens in args.max_tokens:
+        batches = token_budget_batches(lengths, max_tokens)
+        start = time.perf_counter()
+        encode_bucketed(model, texts, max_tokens, lengths=lengths)
+        rate = len(texts) / (time.perf_counter() - start)
+        print(f"{'<= ' + str(max_tokens) + ' tokens, ' + str(len(batches)) + ' batches':<28} : padding efficiency "
+              f"{padding_efficiency(lengths, batches):6.1%} | {rate:8.1f} rows/s ({rate / fixed_rate:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
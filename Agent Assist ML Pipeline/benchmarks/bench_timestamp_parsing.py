@@ -0,0 +1,84 @@
+"""
+Checks parse_timestamps on every export format we've seen (including UTC offsets) and
+times it against per-row pd.to_datetime.
+
+Run from the "Agent Assist ML Pipeline" folder:
+    python -m benchmarks.bench_timestamp_parsing
+    python -m benchmarks.bench_timestamp_parsing --rows 2000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.data.data_store import parse_timestamps
+
+# raw value -> what it has to parse to (naive, offsets converted to UTC)
+KNOWN_CASES = {
+    "Jun 01, 2025, 10:00:00 AM": "2025-06-01 10:00:00",
+    "06/01/2025 10:00:00 AM": "2025-06-01 10:00:00",
+    "06/01/2025 10:00 AM": "2025-06-01 10:00:00",
+    "06/01/2025 10:00": "2025-06-01 10:00:00",
+    "2025-06-01 10:00:00": "2025-06-01 10:00:00",
+    "2025-06-01T10:00:00": "2025-06-01 10:00:00",
+    "2025-06-01T10:00:00Z": "2025-06-01 10:00:00",
+    "2025-06-01T10:00:00+00:00": "2025-06-01 10:00:00",
+    "2025-06-01T12:00:00+02:00": "2025-06-01 10:00:00",
+    "2025-06-01 05:00:00-05:00": "2025-06-01 10:00:00",
+    "not a timestamp": None,
+}
+
+
+def check_known_cases():
+    raw = pd.Series(list(KNOWN_CASES) + [None])
+    parsed, unparseable = parse_timestamps(raw)
+    expected = pd.to_datetime(pd.Series(list(KNOWN_CASES.values()) + [None]))
+    failures = [
+        (value, got, want) for value, got, want in zip(raw, parsed, expected)
+        if not (pd.isna(got) and pd.isna(want)) and got != want
+    ]
+    for value, got, want in failures:
+        print(f"  {value!r}: got {got}, expected {want}")
+    if failures or unparseable != 1 or parsed.dt.tz is not None:
+        raise SystemExit(f"parse_timestamps check FAILED ({len(failures)} wrong, {unparseable} unparseable)")
+    print(f"parse_timestamps check passed on {len(KNOWN_CASES)} formats")
+
+
+def synthetic_timestamps(n_rows, seed=42):
+    """
+    Mostly the main export format with a tail of the other formats, and the heavy
+    repetition real exports have.
+    """
+    rng = np.random.default_rng(seed)
+    base = pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 180 * 24 * 60, n_rows // 10), unit="min")
+    values = pd.Series(base.strftime("%b %d, %Y, %I:%M:%S %p")).sample(n_rows, replace=True, random_state=seed)
+    others = rng.random(n_rows) < 0.05
+    values[others] = rng.choice(list(KNOWN_CASES), int(others.sum()))
+    return values.reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    args = parser.parse_args()
+
+    check_known_cases()
+
+    values = synthetic_timestamps(args.rows)
+    start = time.perf_counter()
+    parsed, unparseable = parse_timestamps(values)
+    vectorized = time.perf_counter() - start
+
+    sample = values.head(min(len(values), 20_000))
+    start = time.perf_counter()
+    sample.apply(lambda value: pd.to_datetime(value, errors="coerce", utc=True))
+    per_row = (time.perf_counter() - start) * len(values) / len(sample)
+
+    print(f"\n=== Timestamp Parsing ({len(values)} rows, {values.nunique()} distinct) ===")
+    print(f"parse_timestamps : {vectorized:.2f}s ({unparseable} unparseable)")
+    print(f"per-row (est.)   : {per_row:.2f}s ({per_row / vectorized:.0f}x slower)")
+
+
+if __name__ == "__main__":
+    main()
@@ -35,6 +35,9 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 
+from src.data.data_schema import feedback_to_labels
+from src.data.data_store import LABELED_STORE_PATH, read_table, table_exists
+
 # Optional dependency check for statsmodels (required for Plotly trendlines)
 try:
     import statsmodels.api as _sm  # noqa: F401
@@ -89,16 +92,27 @@ def secondary_line(x, y, name=""):
 
 @st.cache_data(show_spinner=False)
 def load_data(uploaded_files):
-    """Read uploaded CSV(s) or fall back to bundled sample."""
+    """Read uploaded CSV(s), else the labeled store, else fall back to bundled sample."""
+    store_path = str(Path(__file__).parent / LABELED_STORE_PATH)
     if uploaded_files:
         dfs = [pd.read_csv(f) for f in uploaded_files]
+    elif table_exists(store_path):
+        dfs = [read_table(store_path)]
     else:
         sample_path = Path(__file__).parent / "Agent_Assist_Final_Labeled_Data_3.csv"
         dfs = [pd.read_csv(sample_path)]
     df = pd.concat(dfs, ignore_index=True)
 
+    # the store keeps labels and Agent_ID as categoricals; groupby / value_counts / pivot_table
+    # would list every category, including ones the filters removed, as zero-count rows
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(object)
+
     # Type casts
     df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
+    # the store keeps Feedback as int8 (1/0), the charts below group on positive/negative
+    df["Feedback"] = feedback_to_labels(df["Feedback"])
     int_cols = ["hour_of_day", "conversation_length"]
     for col in int_cols:
         if col in df.columns:
@@ -7,6 +7,7 @@ from src.analysis.analysis_organize import export_all_taxonomies_to_csv
 from src.analysis.analysis_organize import label_sub_topics
 from src.data.data_add import label_errors_with_taxonomy
 from src.data.data_add import label_categories_with_taxonomy
+from src.data.data_add import label_table_streaming
 # finalize_data()
 
 print("Running!")
@@ -24,5 +25,8 @@ print("Running!")
 # df = pd.read_csv("final_dataset_july_7.csv")
 # label_errors_with_taxonomy(df=df, new_csv="final_dataset_july_7_2.csv")
 
+# resumable, chunk at a time; rerun after a crash to pick up where it stopped
+# label_table_streaming(source="data/processed/final_cleaned_feedback", output="data/processed/final_labeled_data")
+
 
 print("unlabeled_df" in locals())
\ No newline at end of file
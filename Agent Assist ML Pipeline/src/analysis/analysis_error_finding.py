@@ -2,6 +2,8 @@ import csv
 import time
 from src.models.zero_shot_LLM import prompt_llm
 import pandas as pd
+from src.data.data_store import read_table, table_columns
+from src.data.data_dedup import group_texts
 from src.analysis.analysis_organize import export_all_taxonomies_to_csv
 import random, json
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -36,6 +38,94 @@ Communication Issues:
 4) Misalignment with Caller’s Needs
 """
 
+# the only columns the error finding prompts look at, so the store doesn't have to deserialize the rest
+ERROR_FINDING_COLUMNS = ["topic_label", "Feedback", "Knowledge_Answer", "Knowledge"]
+
+# LLM calls per topic before find_errors_in_batches gives up on it
+MAX_LLM_ATTEMPTS = 5
+
+def read_error_finding_columns(path):
+    """
+    The ERROR_FINDING_COLUMNS path has. Older exports have no Knowledge column,
+    rows without it are treated as having no KB article.
+    """
+    present = set(table_columns(path))
+    return read_table(path, columns=[column for column in ERROR_FINDING_COLUMNS if column in present])
+
+def has_kb_ref(kb_ref):
+    """
+    True when a Knowledge value names an article. Store reads give pd.NA for empty cells,
+    which can't be used in a plain truth test.
+    """
+    return pd.notna(kb_ref) and str(kb_ref).strip() not in {"-", "None", ""}
+
+def merge_group_kb_refs(df, groups):
+    """
+    One Knowledge value per group: the distinct article references of all its rows,
+    comma separated (NA when none of them had one), so a collapsed duplicate keeps
+    the articles its other members were given.
+    """
+    knowledge = df["Knowledge"].to_numpy() if "Knowledge" in df.columns else [pd.NA] * len(df)
+    refs = pd.DataFrame({"group": groups.group_ids, "Knowledge": knowledge})
+    refs = refs[refs["Knowledge"].map(has_kb_ref)]
+    refs["Knowledge"] = refs["Knowledge"].astype(str).str.strip()
+    merged = refs.drop_duplicates().groupby("group", sort=False)["Knowledge"].agg(", ".join)
+    return merged.reindex(range(len(groups))).to_numpy()
+
+def select_summaries(df_subset, budget):
+    """
+    Numbered summary lines for the prompt, rows with a KB article first (each half
+    shuffled), until budget characters are used. Returns the lines and how many
+    rows they stand for (Group_Size of each, 1 without dedup).
+    """
+    # Separate rows with and without a KB article reference
+    with_kb = []
+    without_kb = []
+
+    for i, row in df_subset.iterrows():
+        kb_ref = row.get("Knowledge", "")
+        if has_kb_ref(kb_ref):
+            with_kb.append(row)
+        else:
+            without_kb.append(row)
+
+    # Shuffle each list for variety
+
+    random.shuffle(with_kb)
+    random.shuffle(without_kb)
+
+    # Combine, KB references first
+    ordered_rows = with_kb + without_kb
+
+    # Accumulate selected summaries until limit
+    selected_summaries = []
+    rows_covered = 0
+    total_chars = 0
+    for row in ordered_rows:
+        kb_ref = row.get("Knowledge", "")
+        text = row["Knowledge_Answer"]
+
+        # Add prefix if there was a KB article
+        kb_note = ""
+        if has_kb_ref(kb_ref):
+            kb_note = f"(KB Article provided in transcript: {kb_ref}) \n"
+        group_size = row.get("Group_Size", 1)
+        if group_size > 1:
+            kb_note = f"(seen {group_size} times) " + kb_note
+
+        # Build the text
+        new_text = f"{len(selected_summaries)+1}) '{kb_note}{text}'\n"
+
+        # Stop if the budget would be exceeded
+        if total_chars + len(new_text) > budget:
+            break
+
+        selected_summaries.append(new_text)
+        rows_covered += group_size
+        total_chars += len(new_text)
+
+    return selected_summaries, rows_covered
+
 def process_topic(label, df):
     """
     Function to process one topic label.
@@ -51,7 +141,7 @@ def process_topic(label, df):
 import math
 
 def find_errors_in_batches(csv_link = "../Agent Assist ML Pipeline/data/processed/with_topics.csv", batch_size=10, start_batch=0, csv_store_file="llm_responses.jsonl"):
-    df = pd.read_csv(csv_link)
+    df = read_error_finding_columns(csv_link)
     json_list = []
 
     topic_labels = df["topic_label"].unique()
@@ -95,14 +185,16 @@ def find_errors_in_batches(csv_link = "../Agent Assist ML Pipeline/data/processe
 
             # this has now become
             # comma separated
-            llm_returned_value = False
-            while (not llm_returned_value):
+            for attempt in range(1, MAX_LLM_ATTEMPTS + 1):
                 try:
                     possible_errors = find_errors_by_subset(df_subset)
                     #delay the call to allow for 20 calls per minute
                     time.sleep(3)
-                    llm_returned_value = True
+                    break
                 except Exception as e:
+                    print(f"Attempt {attempt}/{MAX_LLM_ATTEMPTS} for {label} failed: {e}")
+                    if attempt == MAX_LLM_ATTEMPTS:
+                        raise
                     time.sleep(3)
 
             print("LLM Printed:", possible_errors)
@@ -131,7 +223,7 @@ def find_errors_in_batches(csv_link = "../Agent Assist ML Pipeline/data/processe
 
 
 def find_errors_parallel(csv_link="../Agent Assist ML Pipeline/data/processed/with_topics.csv", max_workers=4):
-    df = pd.read_csv(csv_link)
+    df = read_error_finding_columns(csv_link)
     json_list = []
     topic_labels = df["topic_label"].unique()
     print("Topic labels:", topic_labels)
@@ -173,7 +265,7 @@ def find_errors_parallel(csv_link="../Agent Assist ML Pipeline/data/processed/wi
     export_all_taxonomies_to_csv(json_list)
 
 def find_errors(csv_link = "../Agent Assist ML Pipeline\data\processed\with_topics.csv"):
-    df = pd.read_csv(csv_link)
+    df = read_error_finding_columns(csv_link)
     json_list = []
     
     #get our unique topic labels
@@ -206,13 +298,13 @@ def find_errors(csv_link = "../Agent Assist ML Pipeline\data\processed\with_topi
 
     
 def develop_error_taxonomy(
-    csv_link="../Agent Assist ML Pipeline/data/processed/cleaned_feedback.csv",
+    csv_link="../Agent Assist ML Pipeline/data/processed/cleaned_feedback",
     max_tokens=131071
 ):
     import pandas as pd
 
     # Load data
-    df = pd.read_csv(csv_link)
+    df = read_table(csv_link, columns=["Feedback", "Knowledge_Answer"])
 
     # Filter negative calls
     df_subset = df[
@@ -265,12 +357,21 @@ def develop_error_taxonomy(
         print(result)
 
 
-def find_errors_by_subset(df_subset, max_chars = 131071):
+def find_errors_by_subset(df_subset, max_chars = 131071, dedup=True, dedup_threshold=0.8):
     """
     For a subset DataFrame, aggregate knowledge_answers,
     build a prompt, and ask the LLM to analyze errors.
+    With dedup, exact and near duplicate summaries are sent once, marked with how many
+    summaries they stand for, so the prompt budget goes to distinct ones.
     """
     topic_name = df_subset["topic_label"]
+    df_raw = df_subset
+    dedup = dedup and not df_subset.empty
+    if dedup:
+        groups = group_texts(df_subset["Knowledge_Answer"].tolist(), threshold=dedup_threshold)
+        df_subset = df_subset.iloc[groups.representatives].assign(
+            Group_Size=groups.sizes(), Knowledge=merge_group_kb_refs(df_subset, groups)
+        )
     # Build a list of the text summaries, numbered
     summaries = df_subset["Knowledge_Answer"].tolist()
     
@@ -340,51 +441,20 @@ def find_errors_by_subset(df_subset, max_chars = 131071):
     reserved_chars = len(instruction_text) + len(system_text) + 100
 
 
-    # Separate rows with and without a KB article reference
-    with_kb = []
-    without_kb = []
-
-    for i, row in df_subset.iterrows():
-        kb_ref = row.get("Knowledge", "")
-        if kb_ref and kb_ref not in ["-", "None", None, ""]:
-            with_kb.append(row)
-        else:
-            without_kb.append(row)
-
-    # Shuffle each list for variety
-
-    random.shuffle(with_kb)
-    random.shuffle(without_kb)
-
-    # Combine, KB references first
-    ordered_rows = with_kb + without_kb
-
     # Accumulate selected summaries until limit
-    selected_summaries = []
-    total_chars = reserved_chars
-    N = 0
-    for i, row in enumerate(ordered_rows):
-        kb_ref = row.get("Knowledge", "")
-        text = row["Knowledge_Answer"]
-
-        # Add prefix if there was a KB article
-        kb_note = ""
-        if kb_ref and kb_ref not in ["-", "None", None, ""]:
-            kb_note = f"(KB Article provided in transcript: {kb_ref}) \n"
-
-        # Build the text
-        new_text = f"{len(selected_summaries)+1}) '{kb_note}{text}'\n"
-
-        # Stop if max_chars would be exceeded
-        if total_chars + len(new_text) > max_chars:
-            break
-
-        selected_summaries.append(new_text)
-        total_chars += len(new_text)
-
-    # Update N to reflect how many you included
+    selected_summaries, rows_covered = select_summaries(df_subset, max_chars - reserved_chars)
     N = len(selected_summaries)
 
+    if dedup:
+        # measured on the prompt text itself, both sides cut at max_chars the same way
+        raw_summaries, raw_rows = select_summaries(df_raw, max_chars - reserved_chars)
+        sent_chars = sum(map(len, selected_summaries))
+        raw_chars = sum(map(len, raw_summaries))
+        print("\n=== Prompt Duplicate Collapsing ===")
+        print(f"Rows: {len(df_raw)} | groups: {len(groups)}")
+        print(f"Prompt covers {rows_covered} rows in {N} summaries ({sent_chars} characters), "
+              f"without collapsing {raw_rows} rows ({raw_chars} characters)")
+
     if not selected_summaries:
         raise ValueError("No summaries could be added without exceeding max_chars.")
 
@@ -2,6 +2,7 @@ import csv
 import json
 import pandas as pd
 from src.models.zero_shot_LLM import prompt_llm
+from src.models.label_prototypes import LABEL_EXEMPLARS_PATH
 
 def parse_taxonomy_json(json_str):
     """
@@ -268,7 +269,7 @@ SUBTOPIC_TO_PARENT = {
     "164_directory_consultant_performance_area": "HR General / Operations",
 }
 
-def label_sub_topics(csv_store_file, new_file="my_findings.csv"):
+def label_sub_topics(csv_store_file, new_file=LABEL_EXEMPLARS_PATH):
     with open(csv_store_file, "r", newline="", encoding="utf-8") as infile, \
          open(new_file, "w", newline="", encoding="utf-8") as outfile:
         
@@ -1,8 +1,18 @@
+import json
+import os
+import time
 import pandas as pd
-from tqdm import tqdm
-from src.models.label_model import TaxonomyLabeler
-import matplotlib.pyplot as plt
-from IPython.display import display
+from src.data.data_ngram_index import source_fingerprint
+from src.data.data_store import (
+    FINAL_STORE_PATH, LABELED_CATEGORIES_STORE_PATH, LABELED_ERRORS_STORE_PATH, LABELED_STORE_PATH,
+    LABELED_SUBCATEGORIES_STORE_PATH, _part_files, append_table, clear_table, is_csv_path, iter_table_chunks,
+    parse_timestamps, remove_parts, write_table,
+)
+from src.models.label_model import TaxonomyLabeler, rerank_ambiguous
+from src.models.label_prototypes import LABEL_EXEMPLARS_PATH, load_exemplars, prototype_version
+from src.lazy import lazy_import
+
+plt = lazy_import("matplotlib.pyplot")
 
 def preprocess_conversation_times_dataframe(
     df: pd.DataFrame,
@@ -32,17 +42,10 @@ def preprocess_conversation_times_dataframe(
     # Make a copy so original df isn't modified
     df = df.copy()
 
-    print(f"Parsing {len(df)} timestamps with progress bar...")
-
-    parsed_dates = []
-    for ts in tqdm(df[timestamp_column], desc="Parsing timestamps"):
-        parsed = pd.to_datetime(
-            ts,
-            format="%b %d, %Y, %I:%M:%S %p"
-        )
-        parsed_dates.append(parsed)
-
-    df[timestamp_column] = parsed_dates
+    # tables read back from the store already have typed timestamps
+    if not pd.api.types.is_datetime64_any_dtype(df[timestamp_column]):
+        df[timestamp_column], unparseable = parse_timestamps(df[timestamp_column])
+        print(f"Parsed {len(df)} timestamps ({df[timestamp_column].nunique()} distinct), {unparseable} unparseable")
 
     # Extract day of the week (e.g., Monday)
     df["day_of_week"] = df[timestamp_column].dt.day_name()
@@ -124,43 +127,153 @@ taxonomy_label_mapping = {
         "Generic or Unclassifiable Issues"
 }
 
-def label_errors_with_taxonomy(df, new_csv="final_labeled_errors.csv"):
-    taxonomy_labels = [
-        "Confusion About Leave Request Submission or Approval",
-        "Unclear FMLA or Bonding Eligibility Criteria",
-        "Knowledge Base Articles Missing or Not Relevant",
-        "Paycheck Errors, Deductions, or Overpayment Disputes",
-        "Inability to Access HR Systems or Forms",
-        "Employees Unaware of Leave Types or Benefit Interactions",
-        "Difficulty Providing Documentation or Verifying Identity",
-        "Lack of Clear Rules for Leave Accrual and Usage",
-        "Complex or Confusing Enrollment Processes",
-        "Unclear Disability Insurance Procedures",
-        "Delays in Processing or Approving Requests",
-        "Region-Specific Policy or Escalation Confusion",
-        "Inadequate or Vague Communication to Employees",
-        "Generic or Unclassifiable Issues"
-    ]
-    labeler = TaxonomyLabeler(taxonomy_labels)
-    error_texts = df["Knowledge_Answer"].fillna("").astype(str).tolist()
-    labels, scores = labeler.label_errors(error_texts, threshold=0.3)
-    df["Parent Error Topic"] = labels
-    df["Parent Error Similarity Score"] = scores
-    df.to_csv(new_csv, index=False)
-    print("Saved to CSV")
-    
+# description per error label, to blend into its prototype (see label_prototypes). Opt-in:
+# it moves every score, and the 0.3 error threshold was tuned on plain label names, so
+# re-derive the threshold before turning it on, e.g.
+#   {"error": {**TAXONOMIES["error"], "descriptions": ERROR_LABEL_DESCRIPTIONS, "threshold": ...}}
+ERROR_LABEL_DESCRIPTIONS = {label: description for description, label in taxonomy_label_mapping.items()}
+
+ERROR_TAXONOMY_LABELS = [
+    "Confusion About Leave Request Submission or Approval",
+    "Unclear FMLA or Bonding Eligibility Criteria",
+    "Knowledge Base Articles Missing or Not Relevant",
+    "Paycheck Errors, Deductions, or Overpayment Disputes",
+    "Inability to Access HR Systems or Forms",
+    "Employees Unaware of Leave Types or Benefit Interactions",
+    "Difficulty Providing Documentation or Verifying Identity",
+    "Lack of Clear Rules for Leave Accrual and Usage",
+    "Complex or Confusing Enrollment Processes",
+    "Unclear Disability Insurance Procedures",
+    "Delays in Processing or Approving Requests",
+    "Region-Specific Policy or Escalation Confusion",
+    "Inadequate or Vague Communication to Employees",
+    "Generic or Unclassifiable Issues"
+]
+
+CATEGORY_TAXONOMY_LABELS = [
+    'Payroll / Compensation',
+    'Leave Management / FMLA',
+    'Enrollment & Benefits',
+    'Access & Technical Issues',
+    'Retirement',
+    'Other / Miscellaneous',
+    'HR General / Operations',
+    'Taxes & Withholding',
+    'Disability & State Claims',
+    'Verification & Documentation',
+    'Timekeeping & Scheduling',
+    'Job Changes & Terminations']
+
+# from notebooks/category_labeler.ipynb (one label per BERTopic topic, in topic order)
+SUBCATEGORY_TAXONOMY_LABELS = [
+    "Employee Leave Management (California, FMLA, Salesforce Portal)",
+    "Form Assistance & Status Check",
+    "Maternity Leave & FMLA Eligibility Clarification",
+    "Benefits Enrollment & COBRA Coverage",
+    "Job Transfer & Position Change Updates",
+    "Employment Verification Document Submission",
+    "HR Service Center Case Resolution",
+    "Disability Claims & Salary Continuance (EDD, MetLife, SDI)",
+    "Benefits Plan & Severance Enrollment Issues",
+    "Paycheck Discrepancies & Disability Coordination",
+    "Retirement & Pension Contributions (Vanguard, Fidelity)",
+    "Adding Spouse or Dependents (Certificates & Documentation)",
+    "Bank Account Updates & Payment Recalls",
+    "HR Systems & Employee Portals (MyHR, HRConnect)",
+    "State-Specific Leave Policies (Colorado, Washington)",
+    "Department Transfer & Payroll Verification",
+    "CRM System & Call Logging Issues",
+    "Retirement Procedures & Kaiser Permanente Retirement Center",
+    "Tax Withholding & Payroll Deductions",
+    "Overpayment & Repayment Processes",
+    "Wage Increase & Record Verification",
+    "Document Receipt & Processing Timeframes",
+    "HR System Delegation & User Access",
+    "Flexible Spending Accounts (FSA/DCSA) Issues",
+    "Wage Loss Verification (WLV) Letters",
+    "Paycheck Deductions & Tax Coordination",
+    "Mercer Insurance & Benefit Deductions",
+    "Communication & Call Connection Issues",
+    "Delta Dental Coverage Questions",
+    "MetLife Disability Insurance & Claim Processing",
+    "Tuition Reimbursement & Education Benefits",
+    "Employee Personal Information Updates (Name, Address)",
+    "Spousal Insurance Surcharges & Billing",
+    "Training Application (TRA) Status & Withdrawals",
+    "Missing or Insufficient Information Provided",
+    "Dental Procedure & Coverage Queries",
+    "Supervisor Escalation & Callback Requests",
+    "ADP Paystub Retrieval & Documentation",
+    "Licensing, Certification & Registration (LCR Compliance)",
+    "Workers' Compensation & Injury Reporting",
+    "Family Leave (CFRA) Expansion Queries",
+    "Bereavement Leave Policies",
+    "Spousal Surcharge & Letter Clarification",
+    "IT Account & Password Issues",
+    "Bereavement Policy Clarification",
+    "Workers' Compensation Claim Submission (Sedgwick)",
+    "IRS Tax Withholding & Garnishment Issues",
+    "Garnishment Processes & Debt Collection",
+    "Vacation Conversion & Absence Management",
+    "FMLA Leave Approval & Notifications",
+    "HR Delegation Permissions & Submission Issues",
+    "Grandchild Dependent Addition Issues",
+    "Per Diem Contract & Worker Classification",
+    "Death Reporting & Survivor Benefits",
+    "OSHA Training & Case Escalations",
+    "Extended Sick Leave (ESL) Policy Clarification",
+    "Callback Verification & Contractor Security Protocols",
+    "Unclear or Incomplete Employee Queries",
+    "Performance Improvement Plans (PIP) & Feedback Processes",
+]
+
+# every label set we score Knowledge_Answer against, with its threshold and output columns
+# (a spec may also carry "descriptions" for the prototypes, none of the defaults do)
+TAXONOMIES = {
+    "error": {
+        "labels": ERROR_TAXONOMY_LABELS,
+        "threshold": 0.3,
+        "topic_column": "Parent Error Topic",
+        "score_column": "Parent Error Similarity Score",
+    },
+    "category": {
+        "labels": CATEGORY_TAXONOMY_LABELS,
+        "threshold": 0.25,
+        "topic_column": "Parent Category Topic",
+        "score_column": "Parent Category Similarity_Score",
+    },
+    "subcategory": {
+        "labels": SUBCATEGORY_TAXONOMY_LABELS,
+        "threshold": 0.25,
+        "topic_column": "SubCategory Topic",
+        "score_column": "SubCategory Similarity_Score",
+    },
+}
+
+def taxonomy_label_sets(taxonomies, exemplars_path=LABEL_EXEMPLARS_PATH):
+    """
+    name -> (labels, threshold, descriptions, exemplars) as TaxonomyLabeler.score_many takes
+    them. Exemplars come from the reviewed examples at exemplars_path, when it exists.
+    """
+    exemplars = load_exemplars(exemplars_path)
+    return {
+        name: (spec["labels"], spec["threshold"], spec.get("descriptions"),
+               {label: exemplars[label] for label in spec["labels"] if label in exemplars})
+        for name, spec in taxonomies.items()
+    }
+
+def print_similarity_summary(scores, threshold, title="Similarity Score Summary"):
     # Count rows below threshold
-    threshold = 0.3
-    num_below_threshold = (df["Similarity_Score"] < threshold).sum()
-    num_total = len(df)
-    percent_below = (num_below_threshold / num_total) * 100
+    num_below_threshold = int((scores < threshold).sum())
+    num_total = len(scores)
+    percent_below = (num_below_threshold / num_total) * 100 if num_total else 0.0
 
-      # Count rows above threshold
+    # Count rows above threshold
     num_above_threshold = num_total - num_below_threshold
     percent_above = 100 - percent_below
 
     # Print counts and percentages
-    print("\n=== Similarity Score Summary ===")
+    print(f"\n=== {title} ===")
     print(f"Total records: {num_total}")
     print(f"Records below threshold ({threshold}): {num_below_threshold} ({percent_below:.2f}%)")
     print(f"Records above threshold: {num_above_threshold} ({percent_above:.2f}%)")
@@ -170,22 +283,22 @@ def label_errors_with_taxonomy(df, new_csv="final_labeled_errors.csv"):
     bar_length = 50
 
     # Calculate proportional bar lengths
-    below_bar = int((num_below_threshold / num_total) * bar_length)
+    below_bar = int((num_below_threshold / num_total) * bar_length) if num_total else 0
     above_bar = bar_length - below_bar
 
     print(f"Below Threshold  : {'#' * below_bar}{' ' * above_bar} ({percent_below:.2f}%)")
     print(f"Above Threshold  : {'#' * above_bar}{' ' * below_bar} ({percent_above:.2f}%)")
 
+def plot_similarity_scores(scores, threshold, title="Distribution of Similarity Scores"):
     # Plot histogram
     plt.figure(figsize=(8, 6))
-    plt.hist(df["Similarity_Score"], bins=20, color="steelblue", edgecolor="black")
+    plt.hist(scores, bins=20, color="steelblue", edgecolor="black")
 
     # Add threshold line
-    threshold = 0.3
     plt.axvline(threshold, color="red", linestyle="--", linewidth=1.5, label=f"Threshold = {threshold}")
 
     # Add titles and labels
-    plt.title("Distribution of Similarity Scores")
+    plt.title(title)
     plt.xlabel("Similarity Score")
     plt.ylabel("Number of Records")
     plt.legend()
@@ -194,72 +307,234 @@ def label_errors_with_taxonomy(df, new_csv="final_labeled_errors.csv"):
     plt.tight_layout()
     plt.show()
 
-def label_categories_with_taxonomy(df, new_csv="final_labeled_categories.csv"):
-    taxonomy_labels = [
-        'Payroll / Compensation', 
-        'Leave Management / FMLA',
-        'Enrollment & Benefits', 
-        'Access & Technical Issues', 
-        'Retirement',
-        'Other / Miscellaneous',
-        'HR General / Operations',
-        'Taxes & Withholding',
-        'Disability & State Claims', 
-        'Verification & Documentation',
-        'Timekeeping & Scheduling', 
-        'Job Changes & Terminations']
-
-    labeler = TaxonomyLabeler(taxonomy_labels)
-    summary_texts = df["Knowledge_Answer"].fillna("").astype(str).tolist()
-    labels, scores = labeler.label_errors(summary_texts, threshold=0.25)
-    df["Parent Category Topic"] = labels
-    df["Parent Category Similarity_Score"] = scores
-
-    df.to_csv(new_csv, index=False)
-    print("Saved to CSV")
+def label_with_taxonomies(df, taxonomies=None, new_csv=LABELED_STORE_PATH, text_column="Knowledge_Answer",
+                          plot=False, labeler=None, rerank_budget=None, min_margin=0.05):
+    """
+    Labels df against several taxonomies in one run: the model is loaded once, the texts
+    are encoded once, and each label set is just scored against those embeddings.
 
+    Parameters:
+    -----------
+    taxonomies : dict, optional
+        name -> {"labels", "threshold", "topic_column", "score_column"} (see TAXONOMIES,
+        the default, which writes the error, category and subcategory columns).
+    new_csv : str or None
+        Where to save the labeled table (None = don't save). The default is the table the
+        dashboard reads, meant for the full set of taxonomies.
+    plot : bool
+        Show a score histogram per taxonomy.
+    labeler : TaxonomyLabeler, optional
+        Reuse an already loaded labeler.
+    rerank_budget : float or int, optional
+        Rerank up to this share (float) / number (int) of the rows whose top1 - top2 margin
+        is below min_margin with a cross-encoder against their top 3 labels
+        (see rerank_ambiguous). Off by default. The score column keeps the bi-encoder
+        similarity, "<topic_column> Reranked" flags the reranked rows and
+        "<topic_column> Rerank Score" holds their cross-encoder score (NaN elsewhere).
+    """
+    if taxonomies is None:
+        taxonomies = TAXONOMIES
+    if labeler is None:
+        labeler = TaxonomyLabeler()
+
+    texts = df[text_column].fillna("").astype(str).tolist()
+    label_sets = taxonomy_label_sets(taxonomies)
+    reranks = {}
+    if rerank_budget:
+        results = {}
+        for name, result in labeler.score_many(texts, label_sets, k=3, min_margin=min_margin).items():
+            topic_column = taxonomies[name]["topic_column"]
+            result, _ = rerank_ambiguous(texts, result, min_margin=min_margin, budget=rerank_budget,
+                                         title=f"{topic_column} Rerank")
+            results[name] = (result["label"].tolist(), result["score"])
+            reranks[name] = (result["reranked"], result["rerank_score"])
+    else:
+        results = labeler.label_many(texts, label_sets)
+
+    for name, (labels, scores) in results.items():
+        spec = taxonomies[name]
+        df[spec["topic_column"]] = labels
+        df[spec["score_column"]] = scores
+        if name in reranks:
+            # the bi-encoder score no longer explains a reranked label, keep the rerank apart
+            df[f"{spec['topic_column']} Reranked"], df[f"{spec['topic_column']} Rerank Score"] = reranks[name]
+
+    if new_csv is not None:
+        write_table(df, new_csv)
+        print("Saved to", new_csv)
+
+    for name, (labels, scores) in results.items():
+        spec = taxonomies[name]
+        print_similarity_summary(scores, spec["threshold"], title=f"{spec['topic_column']} Similarity Score Summary")
+        if plot:
+            plot_similarity_scores(scores, spec["threshold"], title=f"Distribution of {spec['score_column']}")
 
-    # Count rows below threshold
-    threshold = 0.25
-    num_below_threshold = (df["Similarity_Score"] < threshold).sum()
-    num_total = len(df)
-    percent_below = (num_below_threshold / num_total) * 100
+    return df
 
-    # Count rows above threshold
-    num_above_threshold = num_total - num_below_threshold
-    percent_above = 100 - percent_below
+def label_errors_with_taxonomy(df, new_csv=LABELED_ERRORS_STORE_PATH):
+    return label_with_taxonomies(df, {"error": TAXONOMIES["error"]}, new_csv=new_csv, plot=True)
 
-    # Print counts and percentages
-    print("\n=== Similarity Score Summary ===")
-    print(f"Total records: {num_total}")
-    print(f"Records below threshold ({threshold}): {num_below_threshold} ({percent_below:.2f}%)")
-    print(f"Records above threshold: {num_above_threshold} ({percent_above:.2f}%)")
+def label_categories_with_taxonomy(df, new_csv=LABELED_CATEGORIES_STORE_PATH):
+    return label_with_taxonomies(df, {"category": TAXONOMIES["category"]}, new_csv=new_csv, plot=True)
 
-    # Create a simple ASCII bar chart
-    print("\n[ASCII Bar Chart]")
-    bar_length = 50
+def label_subcategories_with_taxonomy(df, new_csv=LABELED_SUBCATEGORIES_STORE_PATH):
+    return label_with_taxonomies(df, {"subcategory": TAXONOMIES["subcategory"]}, new_csv=new_csv, plot=True)
 
-    # Calculate proportional bar lengths
-    below_bar = int((num_below_threshold / num_total) * bar_length)
-    above_bar = bar_length - below_bar
 
-    print(f"Below Threshold  : {'#' * below_bar}{' ' * above_bar} ({percent_below:.2f}%)")
-    print(f"Above Threshold  : {'#' * above_bar}{' ' * below_bar} ({percent_above:.2f}%)")
+def checkpoint_path(output):
+    return output.rstrip("/\\") + ".checkpoint.json"
 
-    # Plot histogram
-    plt.figure(figsize=(8, 6))
-    plt.hist(df["Similarity_Score"], bins=20, color="steelblue", edgecolor="black")
 
-    # Add threshold line
-    threshold = 0.25
-    plt.axvline(threshold, color="red", linestyle="--", linewidth=1.5, label=f"Threshold = {threshold}")
+def _fsync(path):
+    with open(path, "rb+") as f:
+        os.fsync(f.fileno())
 
-    # Add titles and labels
-    plt.title("Distribution of Similarity Scores")
-    plt.xlabel("Similarity Score")
-    plt.ylabel("Number of Records")
-    plt.legend()
 
-    # Show the plot
-    plt.tight_layout()
-    plt.show()
\ No newline at end of file
+def _save_checkpoint(path, state):
+    # written next to the real file and swapped in, a crash leaves the old checkpoint intact
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _chunk_part(index):
+    return f"chunk-{index:06d}"
+
+
+def _labeling_config(labeler, taxonomies, label_sets):
+    """
+    Everything a chunk's labels depend on, per taxonomy, as stored in the checkpoint.
+    The prototype version covers the model, descriptions, exemplars and weights.
+    """
+    return {
+        name: {
+            "labels": list(labels),
+            "threshold": threshold,
+            "prototype_version": prototype_version(labeler.store_name, labels, descriptions, exemplars,
+                                                   labeler.prototype_weights),
+            "columns": [taxonomies[name]["topic_column"], taxonomies[name]["score_column"]],
+        }
+        for name, (labels, threshold, descriptions, exemplars) in label_sets.items()
+    }
+
+
+def _drop_uncommitted_output(output, state):
+    """
+    Removes whatever a crashed run wrote after its last checkpoint.
+    """
+    if is_csv_path(output):
+        if os.path.exists(output) and state["output_bytes"] == 0:
+            os.remove(output)  # so the next append writes the header again
+        elif os.path.exists(output):
+            with open(output, "rb+") as f:
+                f.truncate(state["output_bytes"])
+        return
+    if os.path.isdir(output):
+        committed = {_chunk_part(i) for i in range(state["chunks_done"])}
+        present = {os.path.basename(path)[:-len(".parquet")] for path in _part_files(output)}
+        remove_parts(output, present - committed)
+
+
+def label_table_streaming(source=FINAL_STORE_PATH, output=LABELED_STORE_PATH, taxonomies=None,
+                          text_column="Knowledge_Answer", chunksize=50_000, labeler=None, restart=False):
+    """
+    label_with_taxonomies for tables too big to hold in memory (multi-million row backfills).
+    source is read chunksize rows at a time, every chunk is labeled and appended to output,
+    then <output>.checkpoint.json records it. Only one chunk is in memory at a time.
+
+    Running it again resumes after the last checkpointed chunk, anything written after
+    that is dropped first. A changed source or chunksize, or any change to what the labels
+    depend on (taxonomies, their labels, thresholds, descriptions, exemplars, model) starts
+    over, and so does restart=True. output is a CSV (appended to) or a store directory (one
+    chunk-NNNNNN part per chunk). Unlike label_with_taxonomies, output is written in
+    place, so it only holds every row once the run has completed.
+
+    Parameters:
+    -----------
+    source : str
+        CSV or store directory to label.
+    output : str
+        Where the labeled rows go. Must differ from source.
+    taxonomies : dict, optional
+        See label_with_taxonomies, defaults to TAXONOMIES.
+    labeler : TaxonomyLabeler, optional
+        Reuse an already loaded labeler.
+
+    Returns:
+    --------
+    dict
+        The final checkpoint state.
+    """
+    if taxonomies is None:
+        taxonomies = TAXONOMIES
+    if os.path.abspath(source) == os.path.abspath(output):
+        raise ValueError("output must differ from source, it is rewritten while source is read")
+
+    if labeler is None:
+        labeler = TaxonomyLabeler()
+    label_sets = taxonomy_label_sets(taxonomies)
+
+    state_path = checkpoint_path(output)
+    state = {
+        "source": source,
+        "fingerprint": source_fingerprint(source, text_column),
+        "taxonomies": _labeling_config(labeler, taxonomies, label_sets),
+        "chunksize": chunksize,
+        "chunks_done": 0,
+        "rows_done": 0,
+        "output_bytes": 0,
+        "complete": False,
+    }
+    saved = None
+    if not restart and os.path.exists(state_path):
+        with open(state_path, encoding="utf-8") as f:
+            saved = json.load(f)
+        same_run = all(saved.get(key) == state[key] for key in ("source", "fingerprint", "taxonomies", "chunksize"))
+        if not same_run:
+            changed = [key for key in ("source", "fingerprint", "taxonomies", "chunksize") if saved.get(key) != state[key]]
+            print(f"{', '.join(changed)} changed since {state_path} was written, starting over")
+            saved = None
+
+    if saved is None:
+        clear_table(output)
+    else:
+        state = saved
+        if state["complete"]:
+            print(f"{output} is already labeled ({state['rows_done']} rows)")
+            return state
+        _drop_uncommitted_output(output, state)
+        print(f"Resuming after chunk {state['chunks_done']} ({state['rows_done']} rows already labeled)")
+    _save_checkpoint(state_path, state)
+
+    start = time.perf_counter()
+    rows_this_run = 0
+    for index, chunk in enumerate(iter_table_chunks(source, chunksize)):
+        if index < state["chunks_done"]:
+            continue
+
+        texts = chunk[text_column].fillna("").astype(str).tolist()
+        for name, (labels, scores) in labeler.label_many(texts, label_sets).items():
+            spec = taxonomies[name]
+            chunk[spec["topic_column"]] = labels
+            chunk[spec["score_column"]] = scores
+
+        append_table(chunk, output, part_name=_chunk_part(index))
+        if is_csv_path(output):
+            _fsync(output)
+            state["output_bytes"] = os.path.getsize(output)
+        state["chunks_done"] = index + 1
+        state["rows_done"] += len(chunk)
+        _save_checkpoint(state_path, state)
+
+        rows_this_run += len(chunk)
+        elapsed = time.perf_counter() - start
+        print(f"Chunk {index}: {len(chunk)} rows | {state['rows_done']} labeled | "
+              f"{rows_this_run / elapsed:.0f} rows/s")
+
+    state["complete"] = True
+    _save_checkpoint(state_path, state)
+    print(f"Saved {state['rows_done']} labeled rows to {output}")
+    return state
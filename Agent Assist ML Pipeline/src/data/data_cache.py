@@ -0,0 +1,125 @@
+import hashlib
+import os
+import sqlite3
+
+# On-disk cache for per-text results that are expensive to recompute (spaCy keywords).
+# Entries are keyed by the sha256 of the text together with a namespace describing
+# everything the result depends on (model name + version, stopwords, ...), so a new
+# model or stopword list simply never hits the old entries - they age out through eviction.
+
+KEYWORD_CACHE_PATH = os.path.join("data", "processed", "keyword_cache.sqlite")
+
+
+def normalize_text(text):
+    return text.strip()
+
+
+def cache_namespace(*parts):
+    """
+    Short fingerprint of everything a cached value depends on.
+    Sets are sorted first so their iteration order doesn't matter.
+    """
+    normalized = [sorted(part) if isinstance(part, (set, frozenset)) else part for part in parts]
+    return hashlib.sha256(repr(normalized).encode("utf-8")).hexdigest()[:16]
+
+
+class KeywordCache:
+    """
+    SQLite backed text -> keywords cache with least-recently-used eviction.
+
+    Parameters:
+    -----------
+    path : str
+        SQLite file, created on first use.
+    namespace : str
+        From cache_namespace(), part of every key.
+    max_entries : int
+        Once exceeded, the least recently used entries are deleted on close().
+    """
+
+    def __init__(self, path=KEYWORD_CACHE_PATH, namespace="", max_entries=500_000):
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS keywords ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS keywords_last_used ON keywords(last_used)")
+        # a counter instead of wall-clock time, so "recently used" is exact within a run
+        self.clock = self.conn.execute("SELECT COALESCE(MAX(last_used), 0) FROM keywords").fetchone()[0]
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.namespace}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts):
+        """
+        Returns {text: cached value} for the texts that are in the cache.
+        """
+        keys = {text: self.key(text) for text in texts}
+        distinct_keys = list(set(keys.values()))
+        values = {}
+        for i in range(0, len(distinct_keys), 900):  # stay under SQLite's bound parameter limit
+            chunk = distinct_keys[i:i + 900]
+            values.update(self.conn.execute(
+                f"SELECT key, value FROM keywords WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall())
+        found = {text: values[key] for text, key in keys.items() if key in values}
+
+        self.clock += 1
+        self.conn.executemany("UPDATE keywords SET last_used = ? WHERE key = ?", [(self.clock, key) for key in values])
+        self.conn.commit()
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, values):
+        """
+        Stores {text: value}.
+        """
+        self.clock += 1
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO keywords (key, value, last_used) VALUES (?, ?, ?)",
+            [(self.key(text), value, self.clock) for text, value in values.items()],
+        )
+        self.conn.commit()
+
+    def evict(self):
+        """
+        Deletes the least recently used entries above max_entries. Returns how many.
+        """
+        size = self.conn.execute("SELECT COUNT(*) FROM keywords").fetchone()[0]
+        excess = size - self.max_entries
+        if excess <= 0:
+            return 0
+        self.conn.execute(
+            "DELETE FROM keywords WHERE key IN (SELECT key FROM keywords ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self.conn.commit()
+        return excess
+
+    def report(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        print(f"Keyword cache: {self.hits} hits / {lookups} lookups ({hit_rate:.1%} hit rate) | {self.path}")
+        return hit_rate
+
+    def close(self):
+        evicted = self.evict()
+        if evicted:
+            print(f"Keyword cache: evicted {evicted} least recently used entries")
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,10 +1,25 @@
+import heapq
 import re
+import time
+from functools import lru_cache
+import numpy as np
 import pandas as pd
-from sklearn.feature_extraction.text import CountVectorizer 
-import spacy
+from src.lazy import lazy_import
+from src.data.data_cache import KEYWORD_CACHE_PATH, KeywordCache, cache_namespace
+from src.data.data_ngrams import count_common_phrases
 
-# Load spaCy model once
-nlp = spacy.load("en_core_web_sm")
+spacy = lazy_import("spacy")
+
+# Load spaCy model once, on first use - importing this module shouldn't pay for it
+@lru_cache(maxsize=None)
+def get_nlp(model_name="en_core_web_sm"):
+    return spacy.load(model_name)
+
+def __getattr__(name):
+    # keeps `from src.data.data_clean import nlp` working
+    if name == "nlp":
+        return get_nlp()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Extended stopword list
 CUSTOM_STOPWORDS = {
@@ -250,50 +265,65 @@ gray_keywords = [
     "documentation", "eligibility"
 ]
 
-def find_common_phrases(df, column="Knowledge_Answer", ngram_range=(2, 4), min_df=20, top_n=300):
+def find_common_phrases(df, column="Knowledge_Answer", ngram_range=(2, 4), min_df=20, top_n=300, chunksize=50_000):
     """
     Extract and return the top N most common n-grams (by frequency) from a DataFrame column.
-    """
-
-    vectorizer = CountVectorizer(ngram_range=ngram_range, min_df=min_df)
-    X = vectorizer.fit_transform(df[column])
-    
-    feature_names = vectorizer.get_feature_names_out()
-    counts = X.sum(axis=0).A1  # Flatten the matrix to 1D array
-
-    phrases_freq = list(zip(feature_names, counts))
-    phrases_freq = sorted(phrases_freq, key=lambda x: x[1], reverse=True)
 
-    df_phrases = pd.DataFrame(phrases_freq, columns=["phrase", "count"])
+    Counted chunk by chunk (see data_ngrams.count_common_phrases), so memory doesn't grow
+    with the corpus. df can also be a CSV path or a store directory.
+    """
+    df_phrases = count_common_phrases(df, column=column, ngram_range=ngram_range, min_df=min_df, chunksize=chunksize)
 
     print(df_phrases.head(50))  # Print top 20 most frequent phrases
 
     return df_phrases
 
+# every rule list compiled into one regex, so a phrase is searched once per rule
+# instead of once per pattern / keyword
+NOISE_REGEX = re.compile("|".join(f"(?:{pattern})" for pattern in noise_patterns))
+USEFUL_REGEX = re.compile("|".join(re.escape(keyword) for keyword in useful_keywords))
+GRAY_REGEX = re.compile("|".join(re.escape(keyword) for keyword in gray_keywords))
+
 def classify_phrase(phrase):
     phrase_l = phrase.lower()
 
     # Rule 1: Check if phrase matches any noise pattern
-    for pattern in noise_patterns:
-        if re.search(pattern, phrase_l):
-            return "noise"
+    if NOISE_REGEX.search(phrase_l):
+        return "noise"
 
     # Rule 2: Check if it contains useful keywords
-    for keyword in useful_keywords:
-        if keyword in phrase_l:
-            return "useful"
+    if USEFUL_REGEX.search(phrase_l):
+        return "useful"
 
     # Rule 3: Check gray zone keywords
-    for keyword in gray_keywords:
-        if keyword in phrase_l:
-            return "gray"
+    if GRAY_REGEX.search(phrase_l):
+        return "gray"
 
     # Default to gray if uncertain
     return "gray"
 
+def classify_phrases(phrases):
+    """
+    Vectorized classify_phrase over a whole Series (or list) of phrases.
+
+    Each rule is one regex pass over the distinct phrases, and the rule order
+    (noise > useful > gray) is resolved with np.select. Missing values are "gray".
+    """
+    phrases = pd.Series(phrases)
+    # object dtype keeps Python re semantics (\d, \b) for Arrow-backed strings too
+    uniques = pd.Series(phrases.dropna().unique(), dtype=object).str.lower()
+
+    is_noise = uniques.str.contains(NOISE_REGEX, na=False).to_numpy()
+    is_useful = uniques.str.contains(USEFUL_REGEX, na=False).to_numpy()
+    # gray keywords and the default both end up "gray", so Rule 3 doesn't need its own pass
+    categories = np.select([is_noise, is_useful], ["noise", "useful"], default="gray")
+
+    lookup = dict(zip(phrases.dropna().unique(), categories))
+    return phrases.map(lookup).fillna("gray").astype(object)
+
 def label_ngrams(common_ngrams):
     df_phrases = pd.DataFrame(common_ngrams, columns=["phrase"])
-    df_phrases["category"] = df_phrases["phrase"].apply(classify_phrase)
+    df_phrases["category"] = classify_phrases(df_phrases["phrase"]).to_numpy()
 
     # Optional: save for human review
     df_phrases.head(700).to_csv("classified_phrases.csv", index=False)
@@ -306,36 +336,252 @@ def filter_phrases(labeled_df, keep=("useful", "gray")):
     Filter out phrases not matching categories in 'keep'.
     """
     labeled_df = labeled_df.copy()
-    labeled_df["category"] = labeled_df["Knowledge_Answer"].apply(classify_phrase)
+    labeled_df["category"] = classify_phrases(labeled_df["Knowledge_Answer"]).to_numpy()
     return labeled_df[labeled_df["category"].isin(keep)].reset_index(drop=True)
 
+def _trie_pattern(phrases):
+    """
+    Builds one regex out of a character trie of the phrases. At any position it
+    matches the longest phrase starting there, and only ever tries the one branch
+    that can match the next character, instead of walking all ~250 alternatives.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = True  # end of a phrase
+
+    def build(node):
+        terminal = "" in node
+        children = [(char, child) for char, child in node.items() if char != ""]
+        if not children:
+            return ""
+
+        branches = []
+        for char, child in sorted(children):
+            # collapse single-child chains into one literal so the regex stays shallow
+            literal = char
+            while len(child) == 1 and "" not in child:
+                (char, child), = child.items()
+                literal += char
+            branches.append(re.escape(literal) + build(child))
+
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if terminal:
+            body = "(?:" + body + ")?"
+        return body
+
+    return build(trie)
+
+
+class NoisePhraseRemover:
+    """
+    Compiled version of the remove_noise_phrases loop.
+
+    The loop applies text.replace(phrase, "") for every phrase in list order, so a phrase
+    is only removed if it is still there once the earlier phrases are gone. This gives the
+    exact same output, but instead of ~250 replace calls per document it scans the text once
+    with a trie regex to find which phrases are present at all, then only replaces those
+    (in list order). A removal can glue two characters together into a new phrase, so the
+    text around a cut is rescanned - but only when the two characters meeting there can
+    actually sit next to each other inside a phrase, which rules out the usual "word  word" cut.
+    """
+
+    def __init__(self, noise_phrases=NOISE_PHRASES):
+        self.noise_phrases = list(noise_phrases)
+
+        # a phrase can appear more than once in the list, remember every position
+        self.positions = {}
+        for position, phrase in enumerate(self.noise_phrases):
+            if phrase:
+                self.positions.setdefault(phrase, []).append(position)
+
+        # the scan only reports the longest phrase at each offset, the shorter ones
+        # starting at the same offset are exactly its prefixes that are phrases too
+        self.prefix_positions = {
+            phrase: [
+                position
+                for end in range(1, len(phrase) + 1) if phrase[:end] in self.positions
+                for position in self.positions[phrase[:end]]
+            ]
+            for phrase in self.positions
+        }
+        self.scanner = re.compile("(?=(" + _trie_pattern(self.positions) + "))")
+        self.max_len = max((len(phrase) for phrase in self.positions), default=0)
+        self.joining_pairs = {phrase[i:i + 2] for phrase in self.positions for i in range(len(phrase) - 1)}
+
+    def _positions_present(self, text):
+        """
+        List positions of every phrase occurring in text (overlapping occurrences included).
+        """
+        positions = set()
+        for longest in set(self.scanner.findall(text)):
+            if longest:
+                positions.update(self.prefix_positions[longest])
+        return positions
+
+    def remove(self, text):
+        text_lower = text.lower()
+
+        # list positions still due, smallest first - exactly the order the loop gets to them
+        queued = self._positions_present(text_lower)
+        if not queued:
+            return text_lower
+        queue = sorted(queued)
+
+        while queue:
+            position = heapq.heappop(queue)
+            # split + join is exactly str.replace(phrase, ""), but tells us where the cuts are
+            pieces = text_lower.split(self.noise_phrases[position])
+            if len(pieces) == 1:
+                continue  # an earlier removal already broke this phrase up
+            text_lower = "".join(pieces)
+
+            cut = 0
+            for piece in pieces[:-1]:
+                cut += len(piece)
+                if 0 < cut < len(text_lower) and text_lower[cut - 1:cut + 1] in self.joining_pairs:
+                    window = text_lower[max(0, cut - self.max_len + 1):cut + self.max_len - 1]
+                    for later in self._positions_present(window):
+                        if later > position and later not in queued:
+                            heapq.heappush(queue, later)
+                            queued.add(later)
+
+        return text_lower
+
+    def remove_batch(self, texts):
+        """
+        Vectorized entry point over a whole column (Series or list).
+        Each distinct text is only cleaned once, missing values stay missing.
+        """
+        texts = pd.Series(texts)
+        uniques = texts.dropna().unique()
+        cleaned = {text: self.remove(text) for text in uniques}
+        result = texts.map(cleaned)
+        if isinstance(texts.dtype, pd.StringDtype):
+            result = result.astype(texts.dtype)
+        return result
+
+
+@lru_cache(maxsize=8)
+def get_noise_remover(noise_phrases=tuple(NOISE_PHRASES)):
+    return NoisePhraseRemover(noise_phrases)
+
+
 def remove_noise_phrases(text, noise_phrases=NOISE_PHRASES):
+    return get_noise_remover(tuple(noise_phrases)).remove(text)
+
+
+def remove_noise_phrases_loop(text, noise_phrases=NOISE_PHRASES):
+    """
+    The original one replace per phrase implementation, kept as the reference
+    for benchmarks/bench_noise_removal.py.
+    """
     text_lower = text.lower()
     for phrase in noise_phrases:
         text_lower = text_lower.replace(phrase, "")
     return text_lower
 
+
+def remove_noise_phrases_batch(texts, noise_phrases=NOISE_PHRASES):
+    return get_noise_remover(tuple(noise_phrases)).remove_batch(texts)
+
 def filter_phrases_by_noise(df):
     """
     Returns a copy of df with cleaned Knowledge_Answer column.
     """
     df_copy = df.copy()
-    df_copy["Knowledge_Answer"] = df_copy["Knowledge_Answer"].apply(remove_noise_phrases)
+    df_copy["Knowledge_Answer"] = remove_noise_phrases_batch(df_copy["Knowledge_Answer"])
     return df_copy
 
-def extract_keywords(text):
-    doc = nlp(text)
+# extract_keywords only reads POS tags and lemmas, the parser and NER never need to run
+UNUSED_PIPES = ["parser", "ner"]
+KEYWORD_POS = {"NOUN", "PROPN", "VERB"}
+
+def _keywords_from_doc(doc):
     tokens = []
     for token in doc:
-        if token.pos_ in {"NOUN", "PROPN", "VERB"}:
+        if token.pos_ in KEYWORD_POS:
             lemma = token.lemma_.lower()
             if lemma not in CUSTOM_STOPWORDS:
                 tokens.append(lemma)
     return " ".join(tokens)
 
-def shorten_summary(df):
+def extract_keywords(text):
+    nlp = get_nlp()
+    disable = [name for name in UNUSED_PIPES if name in nlp.pipe_names]
+    return _keywords_from_doc(nlp(text, disable=disable))
+
+def keyword_cache_namespace():
+    """
+    Everything extract_keywords output depends on besides the text itself.
+    """
+    nlp = get_nlp()
+    return cache_namespace(nlp.meta.get("lang"), nlp.meta.get("name"), nlp.meta.get("version"),
+                           CUSTOM_STOPWORDS, KEYWORD_POS, UNUSED_PIPES)
+
+def extract_keywords_batch(texts, batch_size=256, n_process=1, cache=None):
+    """
+    extract_keywords over a whole column with nlp.pipe.
+
+    Parameters:
+    -----------
+    texts : pd.Series or list of str
+    batch_size : int
+        Documents spaCy processes per batch.
+    n_process : int
+        Worker processes for nlp.pipe (-1 = one per CPU).
+    cache : KeywordCache, optional
+        Texts found in the cache aren't parsed again, the new results are added to it.
+
+    Each distinct text is only processed once, missing values stay missing.
+    """
+    texts = pd.Series(texts)
+    uniques = texts.dropna().unique().tolist()
+    nlp = get_nlp()
+    disable = [name for name in UNUSED_PIPES if name in nlp.pipe_names]
+
+    keywords = cache.get_many(uniques) if cache is not None else {}
+    misses = [text for text in uniques if text not in keywords]
+
+    start = time.perf_counter()
+    docs = nlp.pipe(misses, batch_size=batch_size, n_process=n_process, disable=disable)
+    parsed = {text: _keywords_from_doc(doc) for text, doc in zip(misses, docs)}
+    elapsed = time.perf_counter() - start
+    keywords.update(parsed)
+
+    print(f"Keyword extraction: parsed {len(misses)} of {len(uniques)} distinct docs ({len(texts)} rows) "
+          f"in {elapsed:.1f}s ({len(misses) / max(elapsed, 1e-9):,.0f} docs/s, "
+          f"batch_size={batch_size}, n_process={n_process})")
+    if cache is not None:
+        cache.put_many(parsed)
+        cache.report()
+
+    result = texts.map(keywords)
+    if isinstance(texts.dtype, pd.StringDtype):
+        result = result.astype(texts.dtype)
+    return result
+
+def shorten_texts(texts, batch_size=256, n_process=1, cache_path=KEYWORD_CACHE_PATH):
+    """
+    extract_keywords_batch with the on-disk keyword cache at cache_path (None = no cache).
+    """
+    if cache_path is None:
+        return extract_keywords_batch(texts, batch_size=batch_size, n_process=n_process)
+
+    with KeywordCache(cache_path, namespace=keyword_cache_namespace()) as cache:
+        return extract_keywords_batch(texts, batch_size=batch_size, n_process=n_process, cache=cache)
+
+def shorten_summary(df, batch_size=256, n_process=1, cache_path=KEYWORD_CACHE_PATH):
+    """
+    Replaces Knowledge_Answer with its keywords. Results are cached in cache_path
+    (pass None to disable), so unchanged summaries are never parsed twice across runs.
+    """
     df_copy = df.copy()
-    df_copy["Knowledge_Answer"] = df_copy["Knowledge_Answer"].apply(extract_keywords)
+    df_copy["Knowledge_Answer"] = shorten_texts(
+        df_copy["Knowledge_Answer"], batch_size=batch_size, n_process=n_process, cache_path=cache_path
+    )
     return df_copy
 
 
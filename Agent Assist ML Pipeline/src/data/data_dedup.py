@@ -0,0 +1,242 @@
+import numpy as np
+import pandas as pd
+from src.lazy import lazy_import
+
+sparse = lazy_import("scipy.sparse")
+csgraph = lazy_import("scipy.sparse.csgraph")
+
+# Source_File is left out on purpose: overlapping weekly exports carry the same
+# conversation in two files, and those are exactly the duplicates we want gone
+DEDUP_KEY_COLS = [
+    "Query_Type", "Feedback", "Conversation_Topic", "Conversation_Subtopic",
+    "Knowledge_Answer", "Knowledge", "Agent_ID", "Timestamp", "Summary_Reason",
+]
+
+
+def hash_rows(df, key_cols=DEDUP_KEY_COLS):
+    """
+    Stable 64-bit hash per row of the key columns.
+    Values are compared as stripped strings so the same row hashes the same
+    whether it was read as a number, a string or came back from the store.
+    """
+    key_df = pd.DataFrame({
+        column: df[column].astype("string").str.strip().fillna("") if column in df.columns else ""
+        for column in key_cols
+    })
+    return pd.util.hash_pandas_object(key_df, index=False).to_numpy(dtype=np.uint64)
+
+
+class StreamingDeduplicator:
+    """
+    Drops duplicate rows while chunks stream in, keeping the first occurrence.
+
+    Only the 64-bit row hashes are remembered, as a sorted uint64 array
+    (8 bytes per unique row), so memory doesn't grow with the width of the text columns.
+    """
+
+    def __init__(self, key_cols=DEDUP_KEY_COLS):
+        self.key_cols = key_cols
+        self.seen = np.empty(0, dtype=np.uint64)
+        self.duplicates_by_file = {}
+        self.rows_in = 0
+        self.rows_out = 0
+
+    def _contains(self, hashes):
+        if len(self.seen) == 0:
+            return np.zeros(len(hashes), dtype=bool)
+        positions = np.searchsorted(self.seen, hashes)
+        positions[positions == len(self.seen)] = 0
+        return self.seen[positions] == hashes
+
+    def add(self, hashes):
+        """
+        Marks hashes as seen without filtering anything (e.g. rows already in the store).
+        """
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        self.seen = np.union1d(self.seen, hashes)
+
+    def filter(self, df, hashes=None, source_file=None):
+        """
+        Returns (deduplicated df, kept hashes). hashes can be passed in if they were
+        already computed (e.g. in an ingestion worker).
+        """
+        if hashes is None:
+            hashes = hash_rows(df, self.key_cols)
+
+        keep = ~(pd.Series(hashes).duplicated().to_numpy() | self._contains(hashes))
+        kept_hashes = hashes[keep]
+        self.add(kept_hashes)
+
+        dropped = len(df) - int(keep.sum())
+        if source_file is not None:
+            self.duplicates_by_file[source_file] = self.duplicates_by_file.get(source_file, 0) + dropped
+        self.rows_in += len(df)
+        self.rows_out += len(df) - dropped
+
+        return df[keep], kept_hashes
+
+    def report(self):
+        """
+        Prints how many duplicates every source file contributed.
+        """
+        total = self.rows_in - self.rows_out
+        print("\n=== Deduplication Summary ===")
+        print(f"Rows in: {self.rows_in} | rows kept: {self.rows_out} | duplicates dropped: {total} "
+              f"| seen-set size: {self.seen.nbytes / 1e6:.2f} MB")
+        for source_file, count in sorted(self.duplicates_by_file.items(), key=lambda x: x[1], reverse=True):
+            if count:
+                print(f"  {source_file}: {count} duplicates")
+        return self.duplicates_by_file
+
+
+# Text level grouping, so repeated Knowledge_Answer values are only encoded / sent to the
+# LLM once. Exact duplicates share a normalized text (case, punctuation and spacing
+# ignored). Near duplicates ("Sorry, couldn't find an answer for this" and its
+# variants) are found with MinHash signatures over word shingles: LSH bands pair up
+# candidates, pairs whose estimated Jaccard similarity clears the threshold are
+# joined, and each connected group is represented by its first row.
+
+MINHASH_PRIME = (1 << 31) - 1
+
+
+def normalize_for_dedup(texts):
+    """
+    Lowercased texts with punctuation dropped and whitespace collapsed.
+    """
+    return (
+        pd.Series(texts, dtype="object").fillna("").astype(str).str.lower()
+        .str.replace(r"[^\w\s]", " ", regex=True)
+        .str.split().str.join(" ")
+    )
+
+
+def _shingles(texts, shingle_size):
+    """
+    (owner, shingle hash) for every word shingle of every text; texts shorter than
+    shingle_size are a single shingle.
+    """
+    owners, shingles = [], []
+    for owner, text in enumerate(texts):
+        words = text.split()
+        grams = [" ".join(words[i:i + shingle_size]) for i in range(max(1, len(words) - shingle_size + 1))]
+        owners.extend([owner] * len(grams))
+        shingles.extend(grams)
+    hashes = pd.util.hash_array(np.asarray(shingles, dtype=object))
+    return np.asarray(owners, dtype=np.int64), hashes
+
+
+def minhash_signatures(texts, num_perm=128, shingle_size=3, seed=0):
+    """
+    (len(texts), num_perm) uint32 MinHash signatures of the texts' word shingles.
+    """
+    owners, hashes = _shingles(texts, shingle_size)
+    values = (hashes % MINHASH_PRIME).astype(np.uint64)
+    starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MINHASH_PRIME, num_perm, dtype=np.uint64)
+    b = rng.integers(0, MINHASH_PRIME, num_perm, dtype=np.uint64)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    for i in range(num_perm):
+        permuted = (a[i] * values + b[i]) % MINHASH_PRIME
+        signatures[:, i] = np.minimum.reduceat(permuted, starts)
+    return signatures
+
+
+def near_duplicate_components(signatures, threshold=0.8, bands=16):
+    """
+    Component id per signature row. Rows land in the same LSH bucket when a whole band
+    of their signature matches, and bucket members whose estimated Jaccard similarity
+    to the bucket's first row is >= threshold are joined with it.
+    """
+    n_rows, num_perm = signatures.shape
+    rows_per_band = num_perm // bands
+    sources, targets = [], []
+    for band in range(bands):
+        columns = signatures[:, band * rows_per_band:(band + 1) * rows_per_band]
+        keys = pd.util.hash_pandas_object(pd.DataFrame(columns), index=False).to_numpy()
+        buckets, _ = pd.factorize(keys)
+        _, first_index = np.unique(buckets, return_index=True)
+        heads = first_index[buckets]
+        candidates = np.flatnonzero(heads != np.arange(n_rows))
+        if len(candidates) == 0:
+            continue
+        similarity = (signatures[candidates] == signatures[heads[candidates]]).mean(axis=1)
+        keep = candidates[similarity >= threshold]
+        sources.append(keep)
+        targets.append(heads[keep])
+
+    if not sources:
+        return np.arange(n_rows)
+    sources, targets = np.concatenate(sources), np.concatenate(targets)
+    graph = sparse.coo_matrix((np.ones(len(sources), dtype=np.int8), (sources, targets)), shape=(n_rows, n_rows))
+    _, components = csgraph.connected_components(graph, directed=False)
+    return components
+
+
+class TextGroups:
+    """
+    Rows grouped into exact / near duplicates.
+
+    group_ids[row] is the row's group (numbered by first appearance) and
+    representatives[group] the first row of that group, so work done on the
+    representatives is broadcast back with broadcast().
+    """
+
+    def __init__(self, group_ids, representatives, exact_groups):
+        self.group_ids = group_ids
+        self.representatives = representatives
+        self.exact_groups = exact_groups
+
+    def __len__(self):
+        return len(self.representatives)
+
+    def sizes(self):
+        return np.bincount(self.group_ids, minlength=len(self.representatives))
+
+    def broadcast(self, values):
+        """
+        values per representative -> values per row.
+        """
+        return np.asarray(values)[self.group_ids]
+
+    def report(self, texts, title="Duplicate Collapsing"):
+        """
+        Prints and returns how many rows, encodes and characters the grouping saves.
+        """
+        lengths = pd.Series(texts, dtype="object").fillna("").astype(str).str.len().to_numpy()
+        stats = {
+            "rows": len(self.group_ids),
+            "exact_groups": self.exact_groups,
+            "groups": len(self.representatives),
+            "chars": int(lengths.sum()),
+            "representative_chars": int(lengths[self.representatives].sum()),
+        }
+        stats["saved_encodes"] = stats["rows"] - stats["groups"]
+        stats["saved_chars"] = stats["chars"] - stats["representative_chars"]
+        print(f"\n=== {title} ===")
+        print(f"Rows: {stats['rows']} | exact groups: {stats['exact_groups']} | "
+              f"after near duplicates: {stats['groups']}")
+        print(f"Processing one text per group skips {stats['saved_encodes']} of {stats['rows']} texts "
+              f"({stats['saved_chars']} of {stats['chars']} characters)")
+        return stats
+
+
+def group_texts(texts, near=True, threshold=0.8, num_perm=128, bands=16, shingle_size=3, seed=0):
+    """
+    Groups texts into exact duplicates (same normalized text) and, when near is True,
+    near duplicates (MinHash estimated Jaccard similarity >= threshold).
+    Only one text per exact group is MinHashed.
+    """
+    normalized = normalize_for_dedup(texts)
+    codes, uniques = pd.factorize(normalized)
+    exact_groups = len(uniques)
+
+    components = np.arange(len(uniques))
+    if near and len(uniques) > 1:
+        signatures = minhash_signatures(list(uniques), num_perm=num_perm, shingle_size=shingle_size, seed=seed)
+        components = near_duplicate_components(signatures, threshold=threshold, bands=bands)
+
+    group_ids, _ = pd.factorize(components[codes])
+    _, representatives = np.unique(group_ids, return_index=True)
+    return TextGroups(group_ids, representatives, exact_groups)
@@ -1,97 +1,397 @@
+import hashlib
+import json
 import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
+from src.data.data_schema import apply_schema, feedback_to_int8
+from src.data.data_dedup import DEDUP_KEY_COLS, StreamingDeduplicator, hash_rows
+from src.data.data_store import (
+    CLEANED_STORE_PATH, append_table, clear_table, drop_source_files, parse_timestamps, read_table, table_exists,
+)
 
 
-def load_and_merge_csvs(folder_path: str):
-    # we need the folder path to access all of our files and go through those
-    list_of_dfs = []
+# renaming columns to fit our scheme we are going for
+rename_map = {
+    # This may be dropped fully as it offers no value
+    #"Query": "Query", - our summary contains our query
+    "Query / Topic": "Query_Type",
+    "Reason": "Query_Type",
 
+    "Feedback" : "Feedback",
+    "Value" : "Feedback",
 
-    for file in os.listdir(folder_path):
-        try:
-            # we now have all our csv within the folder
+    "Topics" : "Conversation_Topic",
+    "Sub-topics": "Coversation_Subtopic",
 
-            # we now need to create a panda data frame out of the data
-            file_path = os.path.join(folder_path, file)
-            df = pd.read_csv(file_path) # reading our file
-            df["Source_File"] = file
+    "Type" : "Knowledge_Category",
 
-            # debugging column names
-            print("File Name: " , file , "\n")
-            print("Raw columns from file:", df.columns.tolist())
+    "Summary/Answer/Content": "Knowledge_Answer",
 
-            # renaming columns to fit our scheme we are going for
-            rename_map = {
-                # This may be dropped fully as it offers no value
-                #"Query": "Query", - our summary contains our query
-                "Query / Topic": "Query_Type",
-                "Reason": "Query_Type",
+    "References" : "Knowledge",
 
-                "Feedback" : "Feedback",
-                "Value" : "Feedback",
+    "Agent ID": "Agent_ID",
+    "Agent NUID": "Agent_ID",
 
-                "Topics" : "Conversation_Topic",
-                "Sub-topics": "Coversation_Subtopic",
+    "Created At": "Timestamp",
 
-                "Type" : "Knowledge_Category",
+    "Comments": "Summary_Reason",
+}
+# ANY OTHER COLUMNS THAT WANT TO BE ADDED SHOULD BE ADDED HERE
 
-                "Summary/Answer/Content": "Knowledge_Answer",
+required_cols = [
+    "Query_Type", "Feedback", "Conversation_Topic", "Conversation_Subtopic",
+    "Knowledge_Answer", "Knowledge", "Agent_ID", "Timestamp", "Summary_Reason",
+    "Source_File" # INSERT ANY OTHERS HERE
+]
 
-                "References" : "Knowledge",
 
-                "Agent ID": "Agent_ID",
-                "Agent NUID": "Agent_ID",
+def normalize_dataframe(df, source_file):
+    """
+    Applies our rename_map / required_cols scheme to one raw export.
+    """
+    df["Source_File"] = source_file
+    df = df.rename(columns=rename_map)
 
-                "Created At": "Timestamp",
+    # If a column isn't in our required columns it gets populated with None
+    # This however shouldn't happen considering our data integrity is all well
+    for column in required_cols:
+        if column not in df.columns:
+            df[column] = None
 
-                "Comments": "Summary_Reason",
-            }
-            df = df.rename(columns=rename_map)
-            # ANY OTHER COLUMNS THAT WANT TO BE ADDED SHOULD BE ADDED HERE
-
-            required_cols = [
-                "Query_Type", "Feedback", "Conversation_Topic", "Conversation_Subtopic", 
-                "Knowledge_Answer", "Knowledge", "Agent_ID", "Timestamp", "Summary_Reason",
-                "Source_File" # INSERT ANY OTHERS HERE
-            ]
-
-            # If a column isn't in our required columns it gets populated with None 
-            # This however shouldn't happen considering our data integrity is all well
-            for column in required_cols:
-                if column not in df.columns:
-                    print(column)
-                    df[column] = None
-            
-            df = df[required_cols]
-
-            # Add to our list
-            list_of_dfs.append(df)
-            
-            # Debugging statements
-            print(file)
-            print(df.columns)
-            print(df.head(10))
-            print("\n")
-        except Exception as error:
-            print("Ran into the following error: " , error)
+    return df[required_cols]
 
-    merged_df = pd.concat(list_of_dfs, ignore_index=True) # combine all of our files, our indexing information
-    # also isn't too useful here which is why we use ignore_index as True
 
-    # after we combine them all into one big file we need to drop columns that aren't as relevant
+def file_sha256(file_path, block_size=1 << 20):
+    """
+    Content hash of a raw export, read in blocks so large files don't get loaded whole.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
 
+def default_manifest_path(output_path):
+    """
+    The manifest lives next to the store it describes, e.g.
+    data/processed/cleaned_feedback -> data/processed/cleaned_feedback_manifest.json
+    """
+    output_path = output_path.rstrip("/\\")
+    if output_path.lower().endswith(".csv"):
+        output_path = output_path[:-len(".csv")]
+    return output_path + "_manifest.json"
 
-    merged_df.drop_duplicates(inplace=True) # inplace allows us to not have to make a new data frame
-    # df.drop()
-    output_path = os.path.join("data", "processed", "cleaned_feedback.csv")
-    merged_df.to_csv(output_path, index=False)
 
+def load_manifest(manifest_path):
+    """
+    Returns {file name: {"sha256", "mtime", "size", "rows"}} or {} if there's no manifest yet.
+    """
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
 
-    print(merged_df.columns)
-    print(merged_df.head(1000))
 
+def save_manifest(manifest, manifest_path):
+    # write to a temp file first so a crash can never leave half a manifest behind
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def plan_incremental_ingest(folder_path, manifest):
+    """
+    Compares the export folder against the manifest.
+
+    Returns:
+        changed: file names that are new or whose content changed (need parsing)
+        removed: file names in the manifest that are no longer in the folder
+        touched: {file name: entry} for files whose mtime moved but content didn't
+    Files with the same size and mtime as the manifest entry are trusted without hashing.
+    """
+    changed = []
+    touched = {}
+    files = sorted(
+        file for file in os.listdir(folder_path)
+        if os.path.isfile(os.path.join(folder_path, file))
+    )
+
+    for file in files:
+        file_path = os.path.join(folder_path, file)
+        entry = manifest.get(file)
+        stat = os.stat(file_path)
+        if entry is None:
+            changed.append(file)
+        elif entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            continue
+        elif file_sha256(file_path) == entry["sha256"]:
+            touched[file] = dict(entry, mtime=stat.st_mtime)
+        else:
+            changed.append(file)
+
+    removed = [file for file in manifest if file not in files]
+    return changed, removed, touched
+
+
+def default_hashes_dir(output_path):
+    """
+    Row hashes per export, so incremental runs can dedup new rows against the store
+    without reading it back: <file>.npy holds the rows the export kept, <file>.all.npy
+    every row it had (to find the exports that dropped rows as its duplicates).
+    """
+    return default_manifest_path(output_path)[:-len("_manifest.json")] + "_row_hashes"
+
+
+def dedup_hashes(df):
+    """
+    hash_rows with Timestamp in one canonical form. Exports carry it as raw strings in
+    whatever format, the store gives it back parsed, and both have to hash the same.
+    Unparseable timestamps hash as empty, like the NaT they are stored as.
+    """
+    if "Timestamp" not in df.columns:
+        return hash_rows(df)
+    parsed, _ = parse_timestamps(df["Timestamp"])
+    canonical = pd.to_datetime(parsed).dt.strftime("%Y-%m-%d %H:%M:%S").fillna("")
+    return hash_rows(df.assign(Timestamp=canonical))
+
+
+def _overlapping_exports(hashes_dir, stale, unchanged):
+    """
+    Unchanged exports that share rows with a stale one, directly or through another
+    export in the result. They may have dropped rows as duplicates of rows that are
+    about to go, so they get re-ingested along with the stale ones.
+    Returns None when some export has no full hash set saved (stores from before they were kept).
+    """
+    def full_hashes(file):
+        path = os.path.join(hashes_dir, file + ".all.npy")
+        return np.load(path) if os.path.exists(path) else None
+
+    if not stale:
+        return []
+    sets = {file: full_hashes(file) for file in list(stale) + list(unchanged)}
+    if any(hashes is None for hashes in sets.values()):
+        return None
+
+    reingest = []
+    leaving = np.unique(np.concatenate([sets[file] for file in stale]))
+    found = True
+    while found:
+        found = False
+        for file in unchanged:
+            if file not in reingest and np.isin(sets[file], leaving).any():
+                reingest.append(file)
+                leaving = np.union1d(leaving, sets[file])
+                found = True
+    return reingest
+
+
+def _seed_deduplicator(dedup, output_path, hashes_dir, files):
+    missing = []
+    for file in files:
+        hash_path = os.path.join(hashes_dir, file + ".npy")
+        if os.path.exists(hash_path):
+            dedup.add(np.load(hash_path))
+        else:
+            missing.append(file)
+
+    if missing:
+        # older stores without saved hashes: only the key columns get read back
+        kept = read_table(output_path, columns=DEDUP_KEY_COLS + ["Source_File"])
+        dedup.add(dedup_hashes(kept[kept["Source_File"].isin(missing)]))
+
+
+def _read_normalized_csv(file_path):
+    """
+    Worker for the ingestion pool: parses and normalizes a single export.
+    Returns the normalized frame along with throughput stats for that file.
+    """
+    start = time.perf_counter()
+    file = os.path.basename(file_path)
+
+    df = pd.read_csv(file_path) # reading our file
+    df = apply_schema(normalize_dataframe(df, file))
+
+    # hashing is the expensive part of dedup so it happens here in the worker,
+    # the main process only has to check the hashes against what it has already kept
+    hashes = dedup_hashes(df)
+
+    stat = os.stat(file_path)
+    stats = {
+        "file": file,
+        "rows": len(df),
+        "bytes": stat.st_size,
+        "mtime": stat.st_mtime,
+        "sha256": file_sha256(file_path),
+        "seconds": time.perf_counter() - start,
+    }
+    return df, hashes, stats
+
+
+def iter_normalized_csvs(folder_path, max_workers=None, only_files=None):
+    """
+    Parses every CSV in folder_path (or just the names in only_files) in a process pool
+    and yields (normalized_df, row_hashes, stats) per file, in file name order, as soon as each one is ready.
+    Files that fail to parse are reported and skipped.
+    """
+    files = sorted(
+        os.path.join(folder_path, file)
+        for file in os.listdir(folder_path)
+        if os.path.isfile(os.path.join(folder_path, file))
+        and (only_files is None or file in only_files)
+    )
+
+    max_workers = max_workers or os.cpu_count() or 1
+    # only keep a couple of files in flight per worker so finished frames
+    # don't pile up in memory while we wait on a slow file
+    window = 2 * max_workers
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = []
+        next_file = 0
+        while next_file < len(files) or pending:
+            while next_file < len(files) and len(pending) < window:
+                pending.append((files[next_file], executor.submit(_read_normalized_csv, files[next_file])))
+                next_file += 1
+
+            file_path, future = pending.pop(0)
+            try:
+                df, hashes, stats = future.result()
+            except Exception as error:
+                print("Ran into the following error: " , os.path.basename(file_path), error)
+                continue
+
+            seconds = max(stats["seconds"], 1e-9)
+            print(
+                f"File Name: {stats['file']} | {stats['rows']} rows | "
+                f"{stats['bytes'] / 1e6:.2f} MB | {seconds:.2f}s | "
+                f"{stats['rows'] / seconds:,.0f} rows/s | {stats['bytes'] / 1e6 / seconds:.2f} MB/s"
+            )
+            yield df, hashes, stats
+
+
+def load_and_merge_csvs(
+    folder_path: str,
+    output_path=CLEANED_STORE_PATH,
+    max_workers=None,
+    keep_in_memory=True,
+    incremental=False,
+    manifest_path=None,
+):
+    """
+    Reads every weekly export in folder_path, normalizes it to our column scheme
+    and writes the merged result to output_path.
+
+    output_path is a store directory (see data_store) or a .csv file.
+    Files are parsed in a process pool and each normalized file is appended to
+    output_path as soon as it is ready, so the merged data never has to be held in memory.
+    Pass keep_in_memory=False on large folders to get back the output path instead of the merged frame.
+
+    Duplicate rows (same values in every column but Source_File) are dropped while the
+    files stream in, keeping the first occurrence, and the duplicates per export are reported.
+
+    A manifest (content hash, mtime, size and row count per export) is kept next to output_path.
+    With incremental=True only new or changed exports are parsed: their rows are appended,
+    rows of changed or deleted exports are replaced, and the returned frame only holds the
+    newly ingested rows. Without a usable manifest or output it falls back to a full rebuild.
+    """
+    start = time.perf_counter()
+    manifest_path = manifest_path or default_manifest_path(output_path)
+    manifest = load_manifest(manifest_path)
+    hashes_dir = default_hashes_dir(output_path)
+    dedup = StreamingDeduplicator()
+
+    only_files = None
+    if incremental and manifest and table_exists(output_path):
+        changed, removed, touched = plan_incremental_ingest(folder_path, manifest)
+        # rows from changed or deleted exports have to go before we append the fresh ones
+        stale = [file for file in changed + removed if file in manifest]
+        overlapping = _overlapping_exports(hashes_dir, stale, [file for file in manifest if file not in stale])
+
+        if overlapping is None:
+            print("Incremental ingest: some exports have no saved row hashes, rebuilding everything")
+        else:
+            manifest.update(touched)
+            print(f"Incremental ingest: {len(changed)} new/changed, {len(removed)} removed, "
+                  f"{len(overlapping)} overlapping re-ingested, "
+                  f"{len(manifest) - len(stale) - len(overlapping)} unchanged files")
+
+            stale += overlapping
+            if stale:
+                drop_source_files(output_path, stale)
+                for file in stale:
+                    for suffix in (".npy", ".all.npy"):
+                        hash_path = os.path.join(hashes_dir, file + suffix)
+                        if os.path.exists(hash_path):
+                            os.remove(hash_path)
+            for file in removed:
+                del manifest[file]
+
+            only_files = set(changed) | set(overlapping)
+            _seed_deduplicator(dedup, output_path, hashes_dir, [file for file in manifest if file not in only_files])
+            if not only_files:
+                save_manifest(manifest, manifest_path)
+
+    if only_files is None:
+        manifest = {}
+        clear_table(output_path)
+        if os.path.isdir(hashes_dir):
+            shutil.rmtree(hashes_dir)
+    os.makedirs(hashes_dir, exist_ok=True)
+
+    list_of_dfs = []
+    total_rows = 0
+    total_bytes = 0
+
+    if only_files is None or only_files:
+        for df, hashes, stats in iter_normalized_csvs(folder_path, max_workers=max_workers, only_files=only_files):
+            np.save(os.path.join(hashes_dir, stats["file"] + ".all.npy"), hashes)
+            df, hashes = dedup.filter(df, hashes, source_file=stats["file"])
+            stats["rows"] = len(df)
+
+            # stream the normalized chunk straight into our merged output
+            append_table(df, output_path, part_name=stats["file"])
+            np.save(os.path.join(hashes_dir, stats["file"] + ".npy"), hashes)
+
+            manifest[stats["file"]] = {
+                "sha256": stats["sha256"],
+                "mtime": stats["mtime"],
+                "size": stats["bytes"],
+                "rows": stats["rows"],
+            }
+            # saved after every file, so a crash mid-run only re-processes what didn't land
+            save_manifest(manifest, manifest_path)
+
+            total_rows += stats["rows"]
+            total_bytes += stats["bytes"]
+            if keep_in_memory:
+                list_of_dfs.append(df)
+
+    dedup.report()
+
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(
+        f"Merged {total_rows} rows ({total_bytes / 1e6:.2f} MB) into {output_path} "
+        f"in {elapsed:.2f}s ({total_rows / elapsed:,.0f} rows/s)"
+    )
 
+    if not keep_in_memory:
+        return output_path
 
+    if not list_of_dfs:
+        return apply_schema(pd.DataFrame(columns=required_cols))
+
+    merged_df = pd.concat(list_of_dfs, ignore_index=True) # combine all of our files, our indexing information
+    # also isn't too useful here which is why we use ignore_index as True
+
+    # categoricals with different categories per file come back as plain strings from concat
+    merged_df = apply_schema(merged_df)
+
+    print(merged_df.columns)
 
     return merged_df
 
@@ -107,7 +407,6 @@ def pre_clean_dataframe(df):
     df = df.dropna(how="all")  # Drop rows where all values are NaN
 
     # convert positive and negative to 0s and 1s for training sake
-    df["Feedback"] = df["Feedback"].toLowercase().map({"positive": 1, "negative" : 0})
+    df["Feedback"] = feedback_to_int8(df["Feedback"])
 
     return df
-
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from src.data.data_ngrams import DEFAULT_BUCKETS, StreamingNgramCounter, iter_frame_chunks
+from src.data.data_store import CLEANED_STORE_PATH, is_csv_path, parse_timestamp_column, _part_files
+from src.lazy import lazy_import
+
+sklearn_text = lazy_import("sklearn.feature_extraction.text")
+sparse = lazy_import("scipy.sparse")
+
+# Build-once n-gram index for tuning NOISE_PHRASES: the corpus is tokenized a single
+# time into a doc-term matrix, and every "common phrases for these rows" question after
+# that is a column sum over the selected rows.
+#
+#   data/processed/ngram_index/
+#       matrix.npz        rows x n-grams counts (scipy CSR)
+#       vocabulary.json   column -> n-gram
+#       rows.parquet      per-row metadata to filter on (Feedback, topic_label, month, ...)
+#       meta.json         build parameters + fingerprint of the source data
+#
+# The index is rebuilt automatically when the source fingerprint or the parameters change.
+
+NGRAM_INDEX_PATH = os.path.join("data", "processed", "ngram_index")
+
+METADATA_COLS = [
+    "Feedback", "topic_label", "Query_Type", "Conversation_Topic", "Conversation_Subtopic",
+    "Agent_ID", "Source_File", "Timestamp",
+]
+
+
+def source_fingerprint(source, column="Knowledge_Answer"):
+    """
+    Changes whenever the data behind source does. For files that's the path, size and
+    mtime of every part (no reading), for an in-memory frame it's a hash of the text column
+    and the METADATA_COLS it has (the index stores those too, so an edited Feedback or
+    topic_label has to invalidate it as well).
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, str):
+        paths = [source] if is_csv_path(source) else sorted(_part_files(source))
+        for path in paths:
+            stat = os.stat(path)
+            digest.update(f"{os.path.relpath(path, source)}|{stat.st_size}|{stat.st_mtime_ns}\n".encode("utf-8"))
+    else:
+        if isinstance(source, pd.DataFrame):
+            columns = [column] + [col for col in METADATA_COLS if col in source.columns and col != column]
+            frame = source[columns]
+        else:
+            columns, frame = [column], pd.DataFrame({column: pd.Series(source)})
+        digest.update("|".join(columns).encode("utf-8"))
+        for col in columns:
+            digest.update(pd.util.hash_pandas_object(frame[col].astype("string"), index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class NgramIndex:
+    def __init__(self, matrix, vocabulary, rows, meta):
+        self.matrix = matrix
+        self.vocabulary = np.asarray(vocabulary, dtype=object)
+        self.rows = rows
+        self.meta = meta
+
+    @classmethod
+    def build(cls, source=CLEANED_STORE_PATH, column="Knowledge_Answer", ngram_range=(2, 4), min_df=2,
+              chunksize=50_000, n_buckets=DEFAULT_BUCKETS):
+        """
+        Tokenizes source once. Only n-grams in at least min_df documents are indexed,
+        so queries are exact for any min_df >= this one (smaller values just return less).
+        """
+        # vocabulary without materializing the full one (see data_ngrams)
+        with StreamingNgramCounter(ngram_range=ngram_range, min_df=min_df, n_buckets=n_buckets) as counter:
+            for frame in iter_frame_chunks(source, column, chunksize=chunksize):
+                counter.add_bucket_counts(frame[column].tolist())
+            for frame in iter_frame_chunks(source, column, chunksize=chunksize):
+                counter.add_exact_counts(frame[column].tolist())
+            counter.report()
+            vocabulary = counter.vocabulary()
+
+        # CountVectorizer refuses an empty vocabulary (nothing reached min_df, e.g. a small
+        # month), the index then keeps its rows with no n-gram columns
+        vectorizer = sklearn_text.CountVectorizer(ngram_range=ngram_range, vocabulary=vocabulary) if vocabulary else None
+        matrices, row_frames = [], []
+        for frame in iter_frame_chunks(source, column, extra_columns=METADATA_COLS, chunksize=chunksize):
+            if vectorizer is None:
+                matrices.append(sparse.csr_matrix((len(frame), 0), dtype=np.int32))
+            else:
+                matrices.append(vectorizer.transform(frame[column]).astype(np.int32))
+            row_frames.append(frame.drop(columns=[column]))
+
+        if matrices:
+            matrix = sparse.vstack(matrices, format="csr")
+            rows = pd.concat(row_frames, ignore_index=True)
+        else:
+            matrix = sparse.csr_matrix((0, len(vocabulary)), dtype=np.int32)
+            rows = pd.DataFrame()
+        if "Timestamp" in rows.columns:
+            rows["month"] = parse_timestamp_column(rows.pop("Timestamp")).dt.strftime("%Y-%m").astype("category")
+
+        meta = {
+            "fingerprint": source_fingerprint(source, column),
+            "column": column,
+            "ngram_range": list(ngram_range),
+            "min_df": min_df,
+            "rows": matrix.shape[0],
+            "ngrams": matrix.shape[1],
+        }
+        print(f"N-gram index: {meta['rows']} rows x {meta['ngrams']} n-grams ({matrix.nnz} non-zeros)")
+        return cls(matrix, vocabulary, rows, meta)
+
+    def save(self, path=NGRAM_INDEX_PATH):
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        sparse.save_npz(os.path.join(path, "matrix.npz"), self.matrix)
+        with open(os.path.join(path, "vocabulary.json"), "w", encoding="utf-8") as f:
+            json.dump(self.vocabulary.tolist(), f)
+        self.rows.to_parquet(os.path.join(path, "rows.parquet"), index=False)
+        # meta last: an index without meta.json is never considered up to date
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=2)
+
+    @classmethod
+    def load(cls, path=NGRAM_INDEX_PATH):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(path, "vocabulary.json"), encoding="utf-8") as f:
+            vocabulary = json.load(f)
+        matrix = sparse.load_npz(os.path.join(path, "matrix.npz")).tocsr()
+        rows = pd.read_parquet(os.path.join(path, "rows.parquet"))
+        return cls(matrix, vocabulary, rows, meta)
+
+    def row_mask(self, **filters):
+        """
+        Boolean mask over the indexed rows. Each filter is column=value or column=[values],
+        e.g. row_mask(Feedback=0, month=["2025-06", "2025-07"]).
+        """
+        mask = np.ones(len(self.rows), dtype=bool)
+        for column, value in filters.items():
+            if column not in self.rows.columns:
+                raise KeyError(f"'{column}' is not in the index metadata: {self.rows.columns.tolist()}")
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            mask &= self.rows[column].isin(list(values)).to_numpy()
+        return mask
+
+    def common_phrases(self, min_df=20, top_n=None, mask=None, **filters):
+        """
+        find_common_phrases over the selected rows (mask and/or filters, default all):
+        phrase/count sorted by count, ties alphabetical.
+        """
+        if min_df < self.meta["min_df"]:
+            print(f"Warning: index was built with min_df={self.meta['min_df']}, "
+                  f"n-grams below that are missing from the result")
+
+        selected = self.row_mask(**filters)
+        if mask is not None:
+            selected &= np.asarray(mask, dtype=bool)
+        X = self.matrix[selected].tocsc()
+
+        counts = np.asarray(X.sum(axis=0)).ravel()
+        doc_freq = np.diff(X.indptr)
+        keep = np.flatnonzero(doc_freq >= min_df)
+
+        # vocabulary is sorted, so a stable sort on count keeps ties alphabetical
+        order = keep[np.argsort(-counts[keep], kind="stable")]
+        if top_n is not None:
+            order = order[:top_n]
+        return pd.DataFrame({"phrase": self.vocabulary[order], "count": counts[order]})
+
+
+def load_or_build_index(source=CLEANED_STORE_PATH, path=NGRAM_INDEX_PATH, column="Knowledge_Answer",
+                        ngram_range=(2, 4), min_df=2, **build_kwargs):
+    """
+    Loads the index at path if it was built from the current source data with the same
+    parameters, otherwise (re)builds and saves it.
+    """
+    meta_path = os.path.join(path, "meta.json")
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        expected = {
+            "fingerprint": source_fingerprint(source, column),
+            "column": column,
+            "ngram_range": list(ngram_range),
+            "min_df": min_df,
+        }
+        if all(meta.get(key) == value for key, value in expected.items()):
+            print(f"N-gram index at {path} is up to date")
+            return NgramIndex.load(path)
+        print(f"N-gram index at {path} is stale, rebuilding")
+
+    index = NgramIndex.build(source, column=column, ngram_range=ngram_range, min_df=min_df, **build_kwargs)
+    index.save(path)
+    return index
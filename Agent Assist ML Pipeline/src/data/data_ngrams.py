@@ -0,0 +1,242 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import numpy as np
+import pandas as pd
+from src.data.data_store import is_csv_path, list_months, read_table, table_columns
+from src.lazy import lazy_import
+
+sklearn_features = lazy_import("sklearn.feature_extraction")
+sklearn_text = lazy_import("sklearn.feature_extraction.text")
+
+# find_common_phrases without ever holding the whole corpus' vocabulary.
+#
+# Pass 1 hashes every n-gram and counts, per hash bucket, how many documents contain it,
+# in a two-row count-min sketch (n_buckets and n_buckets - 1 buckets, coprime, so two
+# n-grams only share both buckets when their full hashes match). A bucket's document
+# frequency is an upper bound for every n-gram hashed into it, so only n-grams whose
+# buckets both reach min_df can possibly make the cut.
+# Pass 2 counts those candidates exactly, chunk by chunk, and merges the counts.
+#
+# Memory is the sketch (2 * n_buckets * 8 bytes) plus at most max_candidates merged
+# counts. On a big corpus with a low min_df most buckets fill up and most n-grams stay
+# candidates, so once max_candidates is reached the counts are spilled into a temporary
+# SQLite file and merged there. Memory then stays flat, the disk holds the candidate
+# vocabulary. Pass 1 prints the average bucket load; when it is near min_df, more
+# buckets make pass 2 cheaper. Tokenization is CountVectorizer's defaults, so the result
+# is the same phrase/count table find_common_phrases returns.
+
+DEFAULT_BUCKETS = 2 ** 22
+DEFAULT_MAX_CANDIDATES = 2_000_000
+# hash space both sketch rows are taken from (HashingVectorizer's largest n_features)
+HASH_SPACE = 2 ** 31 - 1
+
+
+def iter_frame_chunks(source, column="Knowledge_Answer", extra_columns=(), chunksize=50_000):
+    """
+    Yields DataFrames of column + extra_columns (the ones that exist), rows with a missing
+    column value dropped. source is a DataFrame / Series / list, a CSV, or a store directory
+    (read one month partition at a time).
+    """
+    if isinstance(source, str):
+        available = table_columns(source)
+        usecols = [column] + [c for c in extra_columns if c in available and c != column]
+        if is_csv_path(source):
+            for chunk in pd.read_csv(source, usecols=usecols, chunksize=chunksize):
+                yield chunk.dropna(subset=[column]).astype({column: str})
+            return
+        for month in list_months(source):
+            frame = read_table(source, columns=usecols, months=[month])
+            yield from iter_frame_chunks(frame, column, extra_columns, chunksize)
+        return
+
+    if not isinstance(source, pd.DataFrame):
+        source = pd.DataFrame({column: pd.Series(source)})
+    usecols = [column] + [c for c in extra_columns if c in source.columns and c != column]
+    frame = source[usecols].dropna(subset=[column])
+    for start in range(0, len(frame), chunksize):
+        yield frame.iloc[start:start + chunksize].astype({column: str})
+
+
+def iter_text_chunks(source, column="Knowledge_Answer", chunksize=50_000):
+    """
+    Yields lists of non-missing texts, see iter_frame_chunks.
+    """
+    for frame in iter_frame_chunks(source, column, chunksize=chunksize):
+        yield frame[column].tolist()
+
+
+class StreamingNgramCounter:
+    """
+    Parameters:
+    -----------
+    ngram_range : tuple
+        Same as CountVectorizer's.
+    min_df : int
+        Minimum number of documents an n-gram has to appear in.
+    n_buckets : int
+        Width of each sketch row for the first pass. More buckets = fewer false
+        candidates in pass 2.
+    max_candidates : int
+        Merged counts held in memory before they are spilled to disk.
+    """
+
+    def __init__(self, ngram_range=(2, 4), min_df=20, n_buckets=DEFAULT_BUCKETS, max_candidates=DEFAULT_MAX_CANDIDATES):
+        self.ngram_range = ngram_range
+        self.min_df = min_df
+        self.widths = (n_buckets, n_buckets - 1)
+        self.max_candidates = max_candidates
+        self.hasher = sklearn_text.HashingVectorizer(
+            ngram_range=ngram_range, n_features=HASH_SPACE, alternate_sign=False, norm=None, binary=True
+        )
+        # what HashingVectorizer uses under the hood, for hashing single phrases
+        self.phrase_hasher = sklearn_features.FeatureHasher(
+            n_features=HASH_SPACE, input_type="string", alternate_sign=False
+        )
+        self.bucket_df = [np.zeros(width, dtype=np.int64) for width in self.widths]
+        self.incidences = 0
+        self.counts = {}  # phrase -> [count, document frequency], since the last spill
+        self.spills = 0
+        self._spill_dir = None
+        self._spill_db = None
+
+    def _hashes(self, phrases):
+        """
+        The pass 1 hash of every phrase. HashingVectorizer hashes the analyzer's output,
+        so hashing the phrase itself as a single token gives the same value.
+        """
+        hashed = self.phrase_hasher.transform([[phrase] for phrase in phrases])
+        return hashed.indices
+
+    def add_bucket_counts(self, texts):
+        """
+        Pass 1: document frequency per hash bucket, in both sketch rows.
+        """
+        if not texts:
+            return
+        hashes = self.hasher.transform(texts).indices
+        self.incidences += len(hashes)
+        for width, bucket_df in zip(self.widths, self.bucket_df):
+            bucket_df += np.bincount(hashes % width, minlength=width)
+
+    def average_bucket_load(self):
+        return self.incidences / self.widths[0]
+
+    def _is_candidate(self, phrases):
+        hashes = self._hashes(phrases)
+        candidate = np.ones(len(phrases), dtype=bool)
+        for width, bucket_df in zip(self.widths, self.bucket_df):
+            candidate &= bucket_df[hashes % width] >= self.min_df
+        return candidate
+
+    def add_exact_counts(self, texts):
+        """
+        Pass 2: exact count and document frequency of the candidate n-grams in texts.
+        """
+        vectorizer = sklearn_text.CountVectorizer(ngram_range=self.ngram_range)
+        try:
+            X = vectorizer.fit_transform(texts)
+        except ValueError:
+            return  # nothing but stopwords / empty strings in this chunk
+        phrases = vectorizer.get_feature_names_out()
+
+        candidate = self._is_candidate(phrases)
+        X = X[:, candidate].tocsc()
+        counts = np.asarray(X.sum(axis=0)).ravel()
+        doc_freq = np.diff(X.indptr)
+
+        for phrase, count, df in zip(phrases[candidate], counts, doc_freq):
+            entry = self.counts.get(phrase)
+            if entry is None:
+                self.counts[phrase] = [int(count), int(df)]
+            else:
+                entry[0] += int(count)
+                entry[1] += int(df)
+        if len(self.counts) > self.max_candidates:
+            self._spill()
+
+    def _spill(self):
+        """
+        Merges the in-memory counts into the on-disk table and empties them.
+        """
+        if self._spill_db is None:
+            self._spill_dir = tempfile.mkdtemp(prefix="ngram_counts_")
+            self._spill_db = sqlite3.connect(os.path.join(self._spill_dir, "counts.sqlite"))
+            self._spill_db.execute(
+                "CREATE TABLE counts (phrase TEXT PRIMARY KEY, count INTEGER, df INTEGER) WITHOUT ROWID"
+            )
+        self._spill_db.executemany(
+            "INSERT INTO counts VALUES (?, ?, ?) "
+            "ON CONFLICT(phrase) DO UPDATE SET count = count + excluded.count, df = df + excluded.df",
+            ((phrase, count, df) for phrase, (count, df) in self.counts.items()),
+        )
+        self._spill_db.commit()
+        self.counts.clear()
+        self.spills += 1
+
+    def _rows(self, top_n=None):
+        if self._spill_db is None:
+            rows = [(phrase, count) for phrase, (count, df) in self.counts.items() if df >= self.min_df]
+            rows.sort(key=lambda x: (-x[1], x[0]))
+            return rows if top_n is None else rows[:top_n]
+        if self.counts:
+            self._spill()
+        # SQLite compares TEXT bytewise, the same order as Python for UTF-8 strings
+        query = "SELECT phrase, count FROM counts WHERE df >= ? ORDER BY count DESC, phrase"
+        if top_n is not None:
+            return self._spill_db.execute(query + " LIMIT ?", (self.min_df, top_n)).fetchall()
+        return self._spill_db.execute(query, (self.min_df,)).fetchall()
+
+    def result(self, top_n=None):
+        """
+        phrase/count DataFrame sorted by count (descending, ties alphabetical),
+        exactly what CountVectorizer(min_df=min_df) gives on the whole corpus.
+        """
+        return pd.DataFrame(self._rows(top_n), columns=["phrase", "count"])
+
+    def vocabulary(self):
+        """
+        Every n-gram in at least min_df documents, sorted.
+        """
+        return sorted(phrase for phrase, _ in self._rows())
+
+    def report(self):
+        candidates = len(self.counts)
+        if self._spill_db is not None:
+            candidates = self._spill_db.execute("SELECT COUNT(*) FROM counts").fetchone()[0] + len(self.counts)
+        load = self.average_bucket_load()
+        print(f"N-gram counter: {candidates} candidates checked exactly "
+              f"({self.spills} spills to disk), average bucket load {load:.1f} for min_df={self.min_df}")
+        if load > self.min_df / 2:
+            print("  the average bucket load is over half of min_df, so rare n-grams often share a bucket "
+                  "that passes, a larger n_buckets would cut the candidates")
+
+    def close(self):
+        if self._spill_db is not None:
+            self._spill_db.close()
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_db = None
+            self._spill_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def count_common_phrases(source, column="Knowledge_Answer", ngram_range=(2, 4), min_df=20, top_n=None,
+                         chunksize=50_000, n_buckets=DEFAULT_BUCKETS, max_candidates=DEFAULT_MAX_CANDIDATES):
+    """
+    Streaming version of find_common_phrases. source is anything iter_text_chunks accepts,
+    it is read twice (once per pass), one chunk at a time.
+    """
+    with StreamingNgramCounter(ngram_range=ngram_range, min_df=min_df, n_buckets=n_buckets,
+                               max_candidates=max_candidates) as counter:
+        for texts in iter_text_chunks(source, column, chunksize):
+            counter.add_bucket_counts(texts)
+        for texts in iter_text_chunks(source, column, chunksize):
+            counter.add_exact_counts(texts)
+        counter.report()
+        return counter.result(top_n)
@@ -2,45 +2,89 @@
 from src.data.data_clean import find_common_phrases
 #from src.data.data_clean import label_ngrams
 #from src.data.data_clean import filter_phrases
-from src.data.data_clean import filter_phrases_by_noise
-from src.data.data_clean import shorten_summary
-from src.data.data_add import preprocess_conversation_length_dataframe
-from src.data.data_add import preprocess_conversation_times_dataframe
+from src.data.data_clean import remove_noise_phrases_batch
+from src.data.data_clean import shorten_texts
+from src.data.data_cache import KEYWORD_CACHE_PATH
+from src.data.data_schema import memory_report
+from src.data.data_store import CLEANED_STORE_PATH, FINAL_STORE_PATH, parse_timestamps, read_table, write_table
 from src.models.label_model import TaxonomyLabeler
 import pandas as pd
+import tracemalloc
+
+def engineer_features(df, text_column="Knowledge_Answer", timestamp_column="Timestamp",
+                      batch_size=256, n_process=1, cache_path=KEYWORD_CACHE_PATH, trace_memory=False):
+    """
+    All of the feature steps in one pass over column references, modifying df in place.
+
+    Same result as filter_phrases_by_noise -> preprocess_conversation_times_dataframe ->
+    preprocess_conversation_length_dataframe -> shorten_summary, but without a df.copy()
+    per step. Only two text columns are ever kept: the original (as Original_Knowledge_Answer)
+    and the final keywords. The noise-filtered text is an intermediate that's dropped at the end.
+
+    Parameters:
+    -----------
+    trace_memory : bool
+        Print the Python heap peak of the stage (tracemalloc) and the frame's memory
+        before and after.
+    """
+    if trace_memory:
+        memory_report(df, "Before feature engineering")
+        tracemalloc.start()
+
+    original = df[text_column]
+    df["Original_Knowledge_Answer"] = original
+
+    cleaned = remove_noise_phrases_batch(original)
+    print("finished filtering by noise")
+
+    if not pd.api.types.is_datetime64_any_dtype(df[timestamp_column]):
+        df[timestamp_column], unparseable = parse_timestamps(df[timestamp_column])
+        print(f"{unparseable} unparseable timestamps")
+    df["day_of_week"] = df[timestamp_column].dt.day_name()
+    df["hour_of_day"] = df[timestamp_column].dt.hour
+    print("finished adding time")
+
+    df["conversation_length"] = cleaned.str.split().str.len()
+    print("finished adding length")
+
+    df[text_column] = shorten_texts(cleaned, batch_size=batch_size, n_process=n_process, cache_path=cache_path)
+    del cleaned
+    print("finished shortening summary")
+
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"Feature engineering peak traced memory: {peak / 1e6:.2f} MB")
+        memory_report(df, "After feature engineering")
+
+    return df
+
+def finalize_data(input_path=CLEANED_STORE_PATH, output_path=FINAL_STORE_PATH):
+    print("Running the data pipeline!")
 
-def finalize_data():
-    # print("Running the data pipeline!")
-    
     # # We run this if given a new CSV and add it to our frame
     # # Maybe consider in the future preprocessing it and then adding it to the dataframe
     # # df = load_and_merge_csvs("data/raw/Agent_Assist_Data")
 
-    # df = pd.read_csv("data/processed/cleaned_feedback.csv")
+    df = read_table(input_path)
+
+    print("Columns in DataFrame:", df.columns.tolist())
 
-    # print("Columns in DataFrame:", df.columns.tolist())
-    
     #df = filter_phrases(df)
     print("preprocessing")
 
-    #Duplicating the Knowledge_Answer column as this gets edited later
-    # df["Original_Knowledge_Answer"] = df["Knowledge_Answer"]
+    # noise filtering, time features, length and shortened summaries in one stage,
+    # Knowledge_Answer is kept as Original_Knowledge_Answer since it gets edited
+    df = engineer_features(df)
 
-    # df = filter_phrases_by_noise(df)
-    # print("finished filtering by noise")
-    # df = preprocess_conversation_times_dataframe(df)
-    # print("finished adding time")
-    # df = preprocess_conversation_length_dataframe(df)
-    # print("finished adding length")
-    # df = shorten_summary(df)
-    # print("finished shortening summary")
-
-    # df.to_csv("data/processed/final_cleaned_feedback_2.csv", index=False)
+    write_table(df, output_path)
 
     # Now we will be labeling our dataset based on the error taxonomy
-    
+
 
     # print("finding common phrases")
     # phrases = find_common_phrases(df)
     # pd.set_option("display.max_rows", 500)
     # print(phrases.head(500))
+
+    return df
@@ -0,0 +1,88 @@
+import pandas as pd
+
+# Central dtypes for the feedback DataFrame, applied once when data is loaded
+# (ingestion and data_store.read_table) so every stage works on the same compact frame.
+#
+# - low-cardinality labels are categoricals (one int code per row instead of a Python string)
+# - Feedback is a nullable int8: 1 = positive, 0 = negative
+# - free text is Arrow-backed, which stores it in one contiguous buffer instead of a Python object per row
+
+CATEGORY_COLS = [
+    # from data_load.required_cols
+    "Query_Type", "Conversation_Topic", "Conversation_Subtopic", "Agent_ID", "Source_File",
+    # added by the topic model / taxonomy labelers / feature engineering
+    "topic_label", "Parent Error Topic", "Parent Category Topic", "SubCategory Topic", "day_of_week",
+]
+
+TEXT_COLS = [
+    "Knowledge_Answer", "Original_Knowledge_Answer", "Knowledge", "Summary_Reason",
+]
+
+INT_COLS = {
+    "hour_of_day": "Int8",
+    "conversation_length": "Int32",
+}
+
+FLOAT_COLS = [
+    "Parent Error Similarity Score", "Parent Category Similarity_Score", "SubCategory Similarity_Score",
+]
+
+FEEDBACK_CODES = {"positive": 1, "negative": 0}
+TEXT_DTYPE = "string[pyarrow]"
+
+
+def feedback_to_int8(series):
+    """
+    Maps "positive"/"negative" (any case, or already 1/0) to a nullable int8.
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype("Int8")
+    codes = series.astype("string").str.strip().str.lower().map(FEEDBACK_CODES)
+    return codes.astype("Int8")
+
+
+def feedback_to_labels(series):
+    """
+    The other way round, for display (e.g. the dashboard's positive/negative charts).
+    """
+    if not pd.api.types.is_numeric_dtype(series):
+        return series
+    return series.map({code: label for label, code in FEEDBACK_CODES.items()})
+
+
+def apply_schema(df):
+    """
+    Casts the canonical columns that are present in df to their schema dtype.
+    Columns we don't know about are left alone. Returns df (modified in place).
+    """
+    for column in CATEGORY_COLS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype("string").astype("category")
+
+    if "Feedback" in df.columns:
+        df["Feedback"] = feedback_to_int8(df["Feedback"])
+
+    for column in TEXT_COLS:
+        if column in df.columns and df[column].dtype != TEXT_DTYPE:
+            df[column] = df[column].astype(TEXT_DTYPE)
+
+    for column, dtype in INT_COLS.items():
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype(dtype)
+
+    for column in FLOAT_COLS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype("float32")
+
+    return df
+
+
+def memory_report(df, label="DataFrame"):
+    """
+    Prints the deep memory usage of df, per column and in total.
+    """
+    usage = df.memory_usage(deep=True, index=False)
+    print(f"\n=== {label} memory: {usage.sum() / 1e6:.2f} MB for {len(df)} rows ===")
+    for column, nbytes in usage.sort_values(ascending=False).items():
+        print(f"  {column:<35} {str(df[column].dtype):<20} {nbytes / 1e6:>8.2f} MB")
+    return usage.sum()
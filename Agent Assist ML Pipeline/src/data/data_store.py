@@ -0,0 +1,308 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from src.data.data_schema import apply_schema
+
+# Every stage reads and writes the dataset through this module.
+# A path ending in .csv is treated as a plain CSV (for uploads / one-off exports),
+# anything else is a Parquet dataset partitioned by month of Timestamp:
+#
+#   data/processed/cleaned_feedback/
+#       month=2025-06/weekly_export_23.csv.parquet
+#       month=2025-07/weekly_export_23.csv.parquet
+#       month=unknown/...                  <- rows whose Timestamp didn't parse
+#
+# Parts are named after the data they hold (one per source export at ingest time)
+# so a single export can be replaced without touching the rest of the store.
+
+CLEANED_STORE_PATH = os.path.join("data", "processed", "cleaned_feedback")
+FINAL_STORE_PATH = os.path.join("data", "processed", "final_cleaned_feedback")
+LABELED_STORE_PATH = os.path.join("data", "processed", "final_labeled_data")
+# single-taxonomy runs get their own tables so they don't replace the full labeled one
+LABELED_ERRORS_STORE_PATH = os.path.join("data", "processed", "labeled_errors")
+LABELED_CATEGORIES_STORE_PATH = os.path.join("data", "processed", "labeled_categories")
+LABELED_SUBCATEGORIES_STORE_PATH = os.path.join("data", "processed", "labeled_subcategories")
+
+PARTITION_COLUMN = "month"
+UNKNOWN_PARTITION = "unknown"
+TIMESTAMP_FORMAT = "%b %d, %Y, %I:%M:%S %p"
+
+# other formats we've seen in exports (re-saved in Excel, API pulls), tried in order
+# for whatever the main format doesn't parse. "mixed" (per value inference) goes last,
+# it's the slowest and only sees the leftovers.
+FALLBACK_TIMESTAMP_FORMATS = [
+    "%m/%d/%Y %I:%M:%S %p",
+    "%m/%d/%Y %I:%M %p",
+    "%m/%d/%Y %H:%M",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "mixed",
+]
+
+
+def is_csv_path(path):
+    return str(path).lower().endswith(".csv")
+
+
+def table_exists(path):
+    if is_csv_path(path):
+        return os.path.isfile(path)
+    return os.path.isdir(path) and any(True for _ in _part_files(path))
+
+
+def parse_timestamps(series, formats=None):
+    """
+    Vectorized timestamp parsing. Every distinct string is parsed once (exports repeat
+    timestamps a lot), with TIMESTAMP_FORMAT first and then each fallback format on what's
+    left. Values no format understands become NaT and are counted, never raised.
+    Values with a UTC offset ("...Z", "...+02:00") are converted to UTC and, like
+    everything else, stored naive.
+
+    Returns (parsed Series aligned with series, number of unparseable values).
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series, 0
+    if formats is None:
+        formats = [TIMESTAMP_FORMAT] + FALLBACK_TIMESTAMP_FORMATS
+
+    codes, uniques = pd.factorize(series)
+    uniques = pd.Series(uniques, dtype="string").str.strip()
+
+    parsed = pd.Series(pd.NaT, index=uniques.index, dtype="datetime64[ns]")
+    for fmt in formats:
+        todo = parsed.isna() & uniques.notna()
+        if not todo.any():
+            break
+        # utc=True so offsets parse instead of raising, then back to naive like the rest
+        parsed[todo] = pd.to_datetime(uniques[todo], format=fmt, errors="coerce", utc=True).dt.tz_convert(None)
+
+    values = parsed.to_numpy().take(codes)
+    values[codes == -1] = np.datetime64("NaT")
+    result = pd.Series(values, index=series.index, name=series.name)
+
+    unparseable = int((parsed.isna() & uniques.notna()).to_numpy().take(codes)[codes != -1].sum())
+    return result, unparseable
+
+
+def parse_timestamp_column(series):
+    """
+    Turns the raw export timestamps into datetime64 so they are stored typed
+    and never have to be re-parsed downstream. Unparseable values become NaT.
+    """
+    parsed, unparseable = parse_timestamps(series)
+    if unparseable:
+        print(f"Warning: {unparseable} timestamps in {series.name} could not be parsed (stored as NaT)")
+    return parsed
+
+
+def _month_keys(table, timestamp_column):
+    if timestamp_column not in table.column_names:
+        return pa.array([UNKNOWN_PARTITION] * table.num_rows)
+    months = pc.strftime(table[timestamp_column], format="%Y-%m")
+    return pc.fill_null(months, UNKNOWN_PARTITION)
+
+
+def _part_files(path):
+    for root, _, files in os.walk(path):
+        for file in files:
+            if file.endswith(".parquet"):
+                yield os.path.join(root, file)
+
+
+def _prepare_frame(df, timestamp_column):
+    if timestamp_column in df.columns and not pd.api.types.is_datetime64_any_dtype(df[timestamp_column]):
+        df = df.assign(**{timestamp_column: parse_timestamp_column(df[timestamp_column])})
+    return df
+
+
+def _uniform_dictionaries(table):
+    """
+    pandas picks the smallest index type per categorical (int8, int16, ...), which
+    would differ between parts written at different times. Always store int32 indices.
+    """
+    fields = []
+    for field in table.schema:
+        if pa.types.is_dictionary(field.type):
+            field = field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+        fields.append(field)
+    return table.cast(pa.schema(fields, metadata=table.schema.metadata))
+
+
+def write_partitioned(df, path, part_name="part-0", timestamp_column="Timestamp"):
+    """
+    Writes df into the store as month=YYYY-MM/<part_name>.parquet files.
+    The whole frame is converted to one Arrow table first so every month gets the same schema.
+    """
+    df = _prepare_frame(df, timestamp_column)
+    table = _uniform_dictionaries(pa.Table.from_pandas(df, preserve_index=False))
+    months = _month_keys(table, timestamp_column)
+
+    for month in pc.unique(months).to_pylist():
+        month_dir = os.path.join(path, f"{PARTITION_COLUMN}={month}")
+        os.makedirs(month_dir, exist_ok=True)
+        pq.write_table(table.filter(pc.equal(months, month)), os.path.join(month_dir, f"{part_name}.parquet"))
+
+
+def remove_parts(path, part_names):
+    """
+    Deletes every month's part file for the given part names.
+    """
+    targets = {f"{name}.parquet" for name in part_names}
+    for file_path in list(_part_files(path)):
+        if os.path.basename(file_path) in targets:
+            os.remove(file_path)
+
+    # months that no longer hold any part shouldn't show up as partitions
+    for month_dir in os.listdir(path):
+        month_path = os.path.join(path, month_dir)
+        if os.path.isdir(month_path) and not os.listdir(month_path):
+            os.rmdir(month_path)
+
+
+def clear_table(path):
+    if is_csv_path(path):
+        if os.path.exists(path):
+            os.remove(path)
+    elif os.path.isdir(path):
+        shutil.rmtree(path)
+
+
+def append_table(df, path, part_name="part-0", timestamp_column="Timestamp"):
+    """
+    Adds rows to a table. For a CSV that's an append (header only on a new file),
+    for the store it writes (or overwrites) the part_name files.
+    """
+    if is_csv_path(path):
+        header = not os.path.exists(path)
+        df.to_csv(path, mode="w" if header else "a", header=header, index=False)
+    else:
+        write_partitioned(df, path, part_name=part_name, timestamp_column=timestamp_column)
+
+
+def drop_source_files(path, source_files, chunksize=100_000):
+    """
+    Removes the rows that came from source_files.
+    The store just deletes their parts, a CSV gets rewritten in chunks with every value
+    read back as a plain string so untouched rows round-trip unchanged.
+    """
+    if not is_csv_path(path):
+        remove_parts(path, source_files)
+        return
+
+    tmp_path = path + ".tmp"
+    header_written = False
+    for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunksize):
+        chunk = chunk[~chunk["Source_File"].isin(source_files)]
+        chunk.to_csv(tmp_path, mode="a" if header_written else "w", header=not header_written, index=False)
+        header_written = True
+    os.replace(tmp_path, path)
+
+
+def write_table(df, path, timestamp_column="Timestamp"):
+    """
+    Replaces the whole table at path with df.
+    The store is written next to the old one and swapped in at the end,
+    so readers never see a half written dataset.
+    """
+    if is_csv_path(path):
+        df.to_csv(path, index=False)
+        return
+
+    tmp_path = path.rstrip("/\\") + ".tmp"
+    clear_table(tmp_path)
+    write_partitioned(df, tmp_path, timestamp_column=timestamp_column)
+    clear_table(path)
+    os.replace(tmp_path, path)
+
+
+def _open_dataset(path):
+    """
+    Opens the store with one schema unified across all part files, so parts written
+    at different times (e.g. an all-empty column in one weekly export) still read together.
+    """
+    dataset = ds.dataset(path, format="parquet", partitioning="hive")
+    schemas = [fragment.physical_schema for fragment in dataset.get_fragments()]
+    if len(schemas) > 1:
+        schema = pa.unify_schemas(schemas, promote_options="permissive")
+        schema = schema.append(dataset.schema.field(PARTITION_COLUMN))
+        dataset = ds.dataset(path, format="parquet", partitioning="hive", schema=schema)
+    return dataset
+
+
+def read_table(path, columns=None, months=None):
+    """
+    Reads a table written by this module, with the data_schema dtypes applied.
+
+    Parameters:
+    -----------
+    path : str
+        A .csv file or a store directory.
+    columns : list of str, optional
+        Only these columns get deserialized (column projection). Defaults to all of them.
+    months : list of str, optional
+        "YYYY-MM" partitions to read, the rest of the store is never opened. Store only.
+    """
+    if is_csv_path(path):
+        return apply_schema(pd.read_csv(path, usecols=columns))
+
+    dataset = _open_dataset(path)
+    filter_expr = None
+    if months is not None:
+        filter_expr = ds.field(PARTITION_COLUMN).isin(list(months))
+
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name != PARTITION_COLUMN]
+
+    return apply_schema(dataset.to_table(columns=list(columns), filter=filter_expr).to_pandas())
+
+
+def table_columns(path):
+    """
+    Column names of a table, without reading any rows.
+    """
+    if is_csv_path(path):
+        return pd.read_csv(path, nrows=0).columns.tolist()
+    return [name for name in _open_dataset(path).schema.names if name != PARTITION_COLUMN]
+
+
+def list_months(path):
+    """
+    The month partitions present in a store, sorted.
+    """
+    prefix = f"{PARTITION_COLUMN}="
+    return sorted(
+        name[len(prefix):] for name in os.listdir(path)
+        if name.startswith(prefix) and os.path.isdir(os.path.join(path, name))
+    )
+
+
+def iter_table_chunks(path, chunksize=50_000):
+    """
+    Yields a table as DataFrames of chunksize rows (the last one shorter), all columns,
+    schema applied. A store is streamed as record batches over its part files in sorted
+    path order (months first), so memory stays at about one chunk however big a month
+    is, and the chunk boundaries are the same on every call.
+    """
+    if is_csv_path(path):
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            yield apply_schema(chunk)
+        return
+
+    dataset = _open_dataset(path)
+    columns = [name for name in dataset.schema.names if name != PARTITION_COLUMN]
+    pending = None
+    for fragment in sorted(dataset.get_fragments(), key=lambda fragment: fragment.path):
+        for batch in fragment.to_batches(schema=dataset.schema, columns=columns, batch_size=chunksize):
+            # batches end at row group and file boundaries, regroup them into full chunks
+            batch = pa.Table.from_batches([batch])
+            pending = batch if pending is None else pa.concat_tables([pending, batch])
+            while pending.num_rows >= chunksize:
+                yield apply_schema(pending.slice(0, chunksize).to_pandas())
+                pending = pending.slice(chunksize)
+    if pending is not None and pending.num_rows:
+        yield apply_schema(pending.to_pandas())
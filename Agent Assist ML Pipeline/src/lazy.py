@@ -0,0 +1,32 @@
+import importlib
+
+# Heavy dependencies (spaCy, torch, sentence_transformers, openai, matplotlib, sklearn)
+# take seconds and hundreds of MB to import, and most commands only need one of them.
+# Modules bind them with lazy_import() at the top instead of a plain import, and the
+# real import happens the first time an attribute is used:
+#
+#   torch = lazy_import("torch")
+#   ...
+#   torch.max(scores, dim=1)   # <- torch is imported here
+
+
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from src.data.data_cache import normalize_text
+
+# Persistent sentence embeddings, so a text is only ever encoded once per model.
+#
+#   data/processed/embeddings/<model>/
+#       vectors.f16    float16 rows, appended in place (read back as a np.memmap)
+#       hashes.u64     uint64 text hash of every row, same order, appended in place
+#       meta.json      model name, dimension, number of committed rows
+#
+# meta.json is the commit marker: both data files are appended and synced first, then
+# meta.json is written next to itself and swapped in. Rows appended by a run that died
+# halfway are ignored (and overwritten) the next time. One writer at a time.
+# Stores from before hashes.u64 (a hashes.npy) are read as is and converted on the next add.
+
+EMBEDDING_STORE_PATH = os.path.join("data", "processed", "embeddings")
+
+
+def text_hash(text):
+    """
+    64-bit key of a normalized text (first 8 bytes of its sha256).
+    """
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+class EmbeddingStore:
+    def __init__(self, model_name, root=EMBEDDING_STORE_PATH):
+        self.model_name = model_name
+        self.path = os.path.join(root, model_name.replace("/", "__"))
+        self.vectors_path = os.path.join(self.path, "vectors.f16")
+        self.hashes_path = os.path.join(self.path, "hashes.u64")
+        self.legacy_hashes_path = os.path.join(self.path, "hashes.npy")
+        self.meta_path = os.path.join(self.path, "meta.json")
+
+        self.dim = None
+        self.rows = 0
+        self.hashes = np.empty(0, dtype=np.uint64)
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            self.dim, self.rows = meta["dim"], meta["rows"]
+            if os.path.exists(self.hashes_path):
+                self.hashes = np.fromfile(self.hashes_path, dtype=np.uint64, count=self.rows)
+            else:
+                self.hashes = np.load(self.legacy_hashes_path)[:self.rows]
+        self._index = pd.Index(self.hashes)
+        self._vectors = None
+
+    def __len__(self):
+        return self.rows
+
+    def vectors(self):
+        """
+        All committed vectors as a read-only (rows, dim) float16 memmap.
+        """
+        if self._vectors is None:
+            if self.rows == 0:
+                return np.empty((0, self.dim or 0), dtype=np.float16)
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float16, mode="r", shape=(self.rows, self.dim))
+        return self._vectors
+
+    def lookup(self, texts):
+        """
+        Row of every text in the store, -1 where it isn't stored yet.
+        """
+        keys = np.fromiter((text_hash(text) for text in texts), dtype=np.uint64, count=len(texts))
+        return self._index.get_indexer(keys)
+
+    def add(self, texts, vectors):
+        """
+        Appends vectors (one per text) and commits them.
+        """
+        vectors = np.asarray(vectors, dtype=np.float16)
+        if len(texts) == 0:
+            return
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        if vectors.shape != (len(texts), self.dim):
+            raise ValueError(f"expected {len(texts)} vectors of size {self.dim}, got {vectors.shape}")
+
+        os.makedirs(self.path, exist_ok=True)
+        keys = np.fromiter((text_hash(text) for text in texts), dtype=np.uint64, count=len(texts))
+        self._append(self.vectors_path, self.rows * self.dim * 2, vectors.tobytes())
+        if os.path.exists(self.hashes_path) or self.rows == 0:
+            self._append(self.hashes_path, self.rows * 8, keys.tobytes())
+        else:
+            # first add to a store with a hashes.npy, rewrite it once as hashes.u64
+            self._append(self.hashes_path, 0, np.concatenate([self.hashes, keys]).tobytes())
+        self.hashes = np.concatenate([self.hashes, keys])
+
+        self.rows += len(texts)
+        # written next to the real file and swapped in, a crash leaves the old commit intact
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"model_name": self.model_name, "dim": self.dim, "rows": self.rows}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.meta_path)
+
+        self._index = pd.Index(self.hashes)
+        self._vectors = None
+
+    @staticmethod
+    def _append(path, committed_bytes, data):
+        with open(path, "ab") as f:
+            # drop whatever an interrupted run appended but never committed
+            f.truncate(committed_bytes)
+            f.seek(0, os.SEEK_END)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def get_or_encode(self, texts, encode):
+        """
+        float32 embeddings for texts, in order. Only texts the store hasn't seen
+        (each distinct one once) are passed to encode(list of str) -> array, then stored.
+        """
+        texts = list(texts)
+        rows = self.lookup(texts)
+
+        missing = list(dict.fromkeys(text for text, row in zip(texts, rows) if row == -1))
+        # texts that only differ in surrounding whitespace share a key, encode one of them
+        missing = list({text_hash(text): text for text in missing}.values())
+        if missing:
+            self.add(missing, encode(missing))
+            rows = self.lookup(texts)
+
+        print(f"Embedding store ({self.model_name}): encoded {len(missing)} new texts for {len(texts)} requested "
+              f"| {self.rows} stored")
+        return np.asarray(self.vectors()[rows], dtype=np.float32)
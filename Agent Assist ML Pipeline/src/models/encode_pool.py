@@ -0,0 +1,106 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import numpy as np
+from src.lazy import lazy_import
+from src.models.length_batching import encode_bucketed
+from src.models.model_registry import get_model
+
+torch = lazy_import("torch")
+
+# Multi-process encoding for big labeling jobs on CPU nodes. Every worker process loads
+# the model once (through its own model registry), texts are cut into chunks that are
+# spread over the workers, and the embeddings come back in input order.
+#
+# Each worker gets cpu_count // workers torch threads so the workers don't fight over cores.
+# Workers are spawned, so scripts using a pool need an `if __name__ == "__main__":` guard.
+
+
+def _init_worker(model_name, backend, threads):
+    torch.set_num_threads(threads)
+    get_model(model_name, "cpu", backend)
+
+
+def _encode_chunk(model_name, backend, texts, batch_size, max_batch_tokens=None):
+    model = get_model(model_name, "cpu", backend)
+    if max_batch_tokens:
+        return encode_bucketed(model, texts, max_batch_tokens)
+    return np.asarray(
+        model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False), dtype=np.float32
+    )
+
+
+class EncodePool:
+    """
+    Parameters:
+    -----------
+    model_name : str
+    backend : str
+        "torch", "int8" or "onnx" (see model_registry).
+    workers : int, optional
+        Worker processes, defaults to the number of CPUs.
+    chunk_size : int
+        Texts sent to a worker at a time. Smaller chunks balance better, larger ones
+        have less overhead.
+    batch_size : int
+        model.encode batch size inside a worker.
+    max_batch_tokens : int, optional
+        Token budget per batch instead of a fixed batch_size (see length_batching).
+    """
+
+    def __init__(self, model_name, backend="torch", workers=None, chunk_size=1000, batch_size=32,
+                 max_batch_tokens=None):
+        self.model_name = model_name
+        self.backend = backend
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        # spawn, not fork: a forked copy of an initialized torch runtime can deadlock
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, backend, threads),
+        )
+
+    def warm_up(self):
+        """
+        Starts every worker and waits until each has loaded the model.
+        """
+        list(self.executor.map(
+            _encode_chunk,
+            [self.model_name] * self.workers,
+            [self.backend] * self.workers,
+            [["warm up"]] * self.workers,
+            [1] * self.workers,
+        ))
+        return self
+
+    def encode(self, texts):
+        """
+        float32 embeddings for texts, in order.
+        """
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        chunks = [texts[i:i + self.chunk_size] for i in range(0, len(texts), self.chunk_size)]
+        results = self.executor.map(
+            _encode_chunk,
+            [self.model_name] * len(chunks),
+            [self.backend] * len(chunks),
+            chunks,
+            [self.batch_size] * len(chunks),
+            [self.max_batch_tokens] * len(chunks),
+        )
+        return np.vstack(list(results))
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,15 +1,120 @@
-from sentence_transformers import SentenceTransformer, util
-import torch
+import os
+import time
+from src.models.embedding_store import EMBEDDING_STORE_PATH, EmbeddingStore
+from src.models.encode_pool import EncodePool
+from src.models.label_prototypes import (
+    DEFAULT_WEIGHTS, PROTOTYPE_STORE_PATH, load_or_build_prototypes, prototype_version,
+)
+from src.models.length_batching import encode_bucketed
+from src.models.model_registry import CROSS_ENCODER, get_model
+import numpy as np
+from src.data.data_dedup import group_texts
+
+# inference backend when none is passed: "torch" (fp32), "int8" or "onnx", see model_registry
+DEFAULT_BACKEND = os.environ.get("LABELER_BACKEND", "torch")
+
+# second stage for rows the bi-encoder can't separate, see rerank_ambiguous
+DEFAULT_CROSS_ENCODER = "cross-encoder/ms-marco-MiniLM-L-6-v2"
 
 
 class TaxonomyLabeler:
-    def __init__(self, taxonomy_labels, model_name='all-mpnet-base-v2'):
+    def __init__(self, taxonomy_labels=None, model_name='all-mpnet-base-v2', embedding_store_path=EMBEDDING_STORE_PATH,
+                 device=None, backend=None, workers=1, chunk_size=1000, max_batch_tokens=None,
+                 dedup_threshold=None, descriptions=None, exemplars=None, prototype_weights=DEFAULT_WEIGHTS,
+                 prototype_store_path=PROTOTYPE_STORE_PATH):
         """
         Initialize the labeler with taxonomy labels and load the embedding model.
+        Embeddings are kept in an EmbeddingStore under embedding_store_path (None = no store),
+        so texts seen in earlier runs are never encoded again.
+        taxonomy_labels can be left out when only label_many is used.
+        The SentenceTransformer itself comes from the model registry, shared by every labeler
+        using the same model and device. backend defaults to $LABELER_BACKEND (or "torch");
+        check_backend_parity tells whether "int8"/"onnx" are good enough to switch to.
+        With workers > 1, anything longer than chunk_size is encoded by an EncodePool of that
+        many CPU processes (call close() when done to stop them).
+        max_batch_tokens switches from fixed batches of 32 to length-sorted batches under that
+        many (padded) tokens, see length_batching.
+        With dedup_threshold set, the texts passed to label_errors / label_many are grouped
+        into exact and near duplicates (data_dedup.group_texts) and only one text per group
+        is encoded, its labels are broadcast to the rest of the group.
+        Texts are scored against label prototypes, blends of the label name, its description
+        ({label: str}) and the centroid of its exemplars ({label: [str]}), see label_prototypes.
+        The prototype matrix is saved under prototype_store_path by version, so an unchanged
+        taxonomy is loaded from disk instead of being encoded again.
         """
         self.taxonomy_labels = taxonomy_labels
-        self.model = SentenceTransformer(model_name)
-        self.label_embeddings = self.model.encode(taxonomy_labels, convert_to_tensor=True, show_progress_bar=True)
+        self.model_name = model_name
+        self.device = device
+        self.backend = backend or DEFAULT_BACKEND
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_batch_tokens = max_batch_tokens
+        self.dedup_threshold = dedup_threshold
+        self.prototype_weights = prototype_weights
+        self.prototype_store_path = prototype_store_path
+        self._prototypes = {}
+        self._model = None
+        self._pool = None
+        # quantized vectors aren't interchangeable with fp32 ones, each backend gets its own store
+        self.store_name = model_name if self.backend == "torch" else f"{model_name}@{self.backend}"
+        self.store = EmbeddingStore(self.store_name, embedding_store_path) if embedding_store_path else None
+        self.label_embeddings = None
+        if taxonomy_labels is not None:
+            self.label_embeddings = self.label_prototypes(taxonomy_labels, descriptions, exemplars)
+
+    @property
+    def model(self):
+        # loaded on first encode, a fully cached relabel never needs it
+        if self._model is None:
+            self._model = get_model(self.model_name, self.device, self.backend)
+        return self._model
+
+    def _encode(self, texts):
+        if self.workers > 1 and len(texts) > self.chunk_size:
+            if self._pool is None:
+                self._pool = EncodePool(self.model_name, self.backend, workers=self.workers, chunk_size=self.chunk_size,
+                                        max_batch_tokens=self.max_batch_tokens)
+            return self._pool.encode(texts)
+        if self.max_batch_tokens:
+            return encode_bucketed(self.model, texts, self.max_batch_tokens)
+        return self.model.encode(texts, convert_to_numpy=True, show_progress_bar=True)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def encode_texts(self, texts):
+        """
+        float32 embeddings, one row per text, through the embedding store when there is one.
+        """
+        if self.store is None:
+            return np.asarray(self._encode(list(texts)), dtype=np.float32)
+        return self.store.get_or_encode(texts, self._encode)
+
+    def label_prototypes(self, taxonomy_labels, descriptions=None, exemplars=None):
+        """
+        (n_labels, dim) prototype matrix for a label set, from memory, disk or built.
+        """
+        version = prototype_version(self.store_name, taxonomy_labels, descriptions, exemplars, self.prototype_weights)
+        if version not in self._prototypes:
+            self._prototypes[version], _ = load_or_build_prototypes(
+                self.encode_texts, self.store_name, taxonomy_labels, descriptions, exemplars,
+                self.prototype_weights, self.prototype_store_path,
+            )
+        return self._prototypes[version]
+
+    def encode_rows(self, texts):
+        """
+        encode_texts for the texts being labeled, collapsing duplicates first when
+        dedup_threshold is set.
+        """
+        if self.dedup_threshold is None:
+            return self.encode_texts(texts)
+        texts = list(texts)
+        groups = group_texts(texts, threshold=self.dedup_threshold)
+        groups.report(texts, title="Labeler Duplicate Collapsing")
+        return groups.broadcast(self.encode_texts([texts[i] for i in groups.representatives]))
 
     def label_errors(self, error_texts, threshold=0.6):
         """
@@ -19,16 +124,235 @@ class TaxonomyLabeler:
             labels: list of label strings
             scores: list of highest similarity scores
         """
-        error_embeddings = self.model.encode(error_texts, convert_to_tensor=True, show_progress_bar=True)
-        cosine_scores = util.cos_sim(error_embeddings, self.label_embeddings)
-        max_scores, best_indices = torch.max(cosine_scores, dim=1)
+        error_embeddings = self.encode_rows(error_texts)
+        return assign_labels(error_embeddings, self.label_embeddings, self.taxonomy_labels, threshold)
+
+    def score(self, texts, threshold=0.6, k=3, min_margin=None, block_size=4096):
+        """
+        label_errors with the runner-up information kept: top-k labels and scores, the
+        top1 - top2 margin and the Other / ambiguous masks (see score_labels).
+        """
+        return score_labels(self.encode_rows(texts), self.label_embeddings, self.taxonomy_labels, threshold,
+                            k=k, min_margin=min_margin, block_size=block_size)
+
+    def score_many(self, texts, taxonomies, k=3, min_margin=None):
+        """
+        score for several label sets, encoding the texts only once.
+        taxonomies is name -> (taxonomy_labels, threshold) or (taxonomy_labels, threshold,
+        descriptions, exemplars), returns name -> score_labels dict.
+        """
+        text_embeddings = self.encode_rows(texts)
+        results = {}
+        for name, (taxonomy_labels, threshold, *sources) in taxonomies.items():
+            results[name] = score_labels(text_embeddings, self.label_prototypes(taxonomy_labels, *sources),
+                                         taxonomy_labels, threshold, k=k, min_margin=min_margin)
+        return results
+
+    def label_many(self, texts, taxonomies):
+        """
+        Labels texts against several label sets, encoding the texts only once.
+
+        Parameters:
+        -----------
+        texts : list of str
+        taxonomies : dict
+            name -> (taxonomy_labels, threshold), optionally followed by descriptions, exemplars
+
+        Returns:
+            dict of name -> (labels, scores), as label_errors returns them
+        """
+        return {
+            name: (result["label"].tolist(), result["score"])
+            for name, result in self.score_many(texts, taxonomies, k=1).items()
+        }
+
+
+def _normalize(embeddings):
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-8)
+
+
+def top_k_scores(text_embeddings, label_embeddings, k=3, block_size=4096):
+    """
+    The k best labels per text by cosine similarity, best first, as (n, k) arrays of
+    label indices and scores. Texts are scored block_size at a time, so only a
+    block_size x n_labels score matrix exists at once.
+    """
+    label_embeddings = _normalize(np.asarray(label_embeddings, dtype=np.float32))
+    n_texts, n_labels = len(text_embeddings), len(label_embeddings)
+    k = min(k, n_labels)
+    indices = np.empty((n_texts, k), dtype=np.int64)
+    scores = np.empty((n_texts, k), dtype=np.float32)
+
+    for start in range(0, n_texts, block_size):
+        block = _normalize(np.asarray(text_embeddings[start:start + block_size], dtype=np.float32))
+        block_scores = block @ label_embeddings.T
+        if k < n_labels:
+            top = np.argpartition(-block_scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(n_labels), block_scores.shape)
+        top_scores = np.take_along_axis(block_scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        indices[start:start + len(block)] = np.take_along_axis(top, order, axis=1)
+        scores[start:start + len(block)] = np.take_along_axis(top_scores, order, axis=1)
+    return indices, scores
+
+
+def score_labels(text_embeddings, label_embeddings, taxonomy_labels, threshold=0.6, k=3, min_margin=None,
+                 block_size=4096):
+    """
+    Top-k scoring with the threshold and the ambiguity check done as masks.
+
+    Returns a dict of arrays, one row per text:
+        "label"       best label, 'Other' where "other" is set
+        "score"       best score
+        "margin"      best score minus the runner-up's (inf with a single label)
+        "other"       best score below threshold (never when threshold is None)
+        "ambiguous"   margin below min_margin (never when min_margin is None)
+        "top_labels"  (n, k) labels, best first
+        "top_scores"  (n, k) scores
+    """
+    # the runner-up is always needed for the margin, even when k=1 is asked for
+    indices, scores = top_k_scores(text_embeddings, label_embeddings, max(k, 2), block_size)
+    taxonomy_labels = np.asarray(taxonomy_labels, dtype=object)
+
+    best = scores[:, 0]
+    margin = scores[:, 0] - scores[:, 1] if scores.shape[1] > 1 else np.full(len(best), np.inf, dtype=np.float32)
+    other = best < threshold if threshold is not None else np.zeros(len(best), dtype=bool)
+    ambiguous = margin < min_margin if min_margin is not None else np.zeros(len(best), dtype=bool)
+
+    top_labels = taxonomy_labels[indices[:, :k]]
+    return {
+        "label": np.where(other, "Other", top_labels[:, 0]).astype(object),
+        "score": best,
+        "margin": margin,
+        "other": other,
+        "ambiguous": ambiguous,
+        "top_labels": top_labels,
+        "top_scores": scores[:, :k],
+    }
+
+
+def assign_labels(text_embeddings, label_embeddings, taxonomy_labels, threshold=0.6):
+    """
+    Best label per text by cosine similarity, 'Other' below threshold (None = always the best).
+    Returns (labels, max scores).
+    """
+    result = score_labels(text_embeddings, label_embeddings, taxonomy_labels, threshold, k=1)
+    return result["label"].tolist(), result["score"]
+
+
+def rerank_ambiguous(texts, result, min_margin=0.05, budget=0.1, model_name=DEFAULT_CROSS_ENCODER,
+                     rerank_threshold=None, device=None, batch_size=64, title="Cross-Encoder Rerank"):
+    """
+    Second opinion for the rows score_labels couldn't separate: texts whose top1 - top2
+    margin is below min_margin are scored by a cross-encoder against their own top-k
+    candidate labels only, and take the candidate it scores highest.
+
+    Parameters:
+    -----------
+    texts : list of str
+        The texts result was computed for.
+    result : dict
+        From score_labels / TaxonomyLabeler.score, with k >= 2.
+    budget : float or int
+        At most this share of the rows (float) or this many rows (int) is reranked,
+        the lowest margins first.
+    rerank_threshold : float, optional
+        Reranked rows whose best cross-encoder score (as CrossEncoder.predict returns it)
+        is below this become 'Other'. None = always take the best candidate.
+
+    Returns:
+    --------
+    (result, report)
+        A copy of result with "label" updated and "reranked" / "rerank_score" added,
+        and a dict with the reranked share, seconds spent and Other rate before / after.
+    """
+    n_rows = len(result["label"])
+    max_rows = int(budget * n_rows) if isinstance(budget, float) else int(budget)
+    candidates = np.flatnonzero(result["margin"] < min_margin)
+    rows = candidates[np.argsort(result["margin"][candidates], kind="stable")[:max_rows]]
+
+    result = dict(result)
+    result["label"] = result["label"].copy()
+    result["reranked"] = np.zeros(n_rows, dtype=bool)
+    result["rerank_score"] = np.full(n_rows, np.nan, dtype=np.float32)
+    other_before = float(np.mean(result["label"] == "Other")) if n_rows else 0.0
+
+    start = time.perf_counter()
+    if len(rows):
+        top_labels = result["top_labels"][rows]
+        pairs = [(texts[row], label) for row, labels in zip(rows, top_labels) for label in labels]
+        model = get_model(model_name, device, CROSS_ENCODER)
+        pair_scores = np.asarray(
+            model.predict(pairs, batch_size=batch_size, show_progress_bar=False), dtype=np.float32
+        ).reshape(top_labels.shape)
+        best = pair_scores.argmax(axis=1)
+        best_scores = pair_scores[np.arange(len(rows)), best]
+        labels = top_labels[np.arange(len(rows)), best]
+        if rerank_threshold is not None:
+            labels = np.where(best_scores < rerank_threshold, "Other", labels)
+        result["label"][rows] = labels
+        result["reranked"][rows] = True
+        result["rerank_score"][rows] = best_scores
+    seconds = time.perf_counter() - start
+
+    report = {
+        "rows": n_rows,
+        "ambiguous": len(candidates),
+        "reranked": len(rows),
+        "reranked_share": len(rows) / n_rows if n_rows else 0.0,
+        "seconds": seconds,
+        "other_before": other_before,
+        "other_after": float(np.mean(result["label"] == "Other")) if n_rows else 0.0,
+    }
+    print(f"\n=== {title} ===")
+    print(f"Ambiguous (margin < {min_margin}): {report['ambiguous']} of {n_rows} rows | "
+          f"reranked {report['reranked']} ({report['reranked_share']:.1%}) in {seconds:.1f}s")
+    print(f"Other rate: {other_before:.1%} -> {report['other_after']:.1%}")
+    return result, report
+
+
+def check_backend_parity(texts, taxonomy_labels, backend, model_name='all-mpnet-base-v2', threshold=0.3,
+                         sample_size=500, min_agreement=0.98, max_score_delta=0.02, seed=0):
+    """
+    Labels a sample of texts with the fp32 model and with backend, and reports how often
+    the labels agree, how far the scores move and how much faster the backend encodes.
+    passed is True when agreement >= min_agreement and the mean score delta <= max_score_delta.
+    """
+    texts = list(texts)
+    if len(texts) > sample_size:
+        rng = np.random.default_rng(seed)
+        texts = [texts[i] for i in sorted(rng.choice(len(texts), sample_size, replace=False))]
 
-        labels = []
-        for score, idx in zip(max_scores, best_indices):
-            if threshold is not None and score < threshold:
-                labels.append("Other")
-            else:
-                labels.append(self.taxonomy_labels[idx])
+    results = {}
+    for name in ("torch", backend):
+        # no embedding or prototype store, so both sides really encode and nothing is written
+        labeler = TaxonomyLabeler(taxonomy_labels, model_name=model_name, embedding_store_path=None, backend=name,
+                                  prototype_store_path=None)
+        # load (and for int8 quantize) the model and run one small batch outside the timing
+        labeler.model.encode(texts[:8] or ["warm up"], convert_to_numpy=True, show_progress_bar=False)
+        start = time.perf_counter()
+        results[name] = labeler.label_errors(texts, threshold=threshold)
+        results[name] += (time.perf_counter() - start,)
 
-        return labels, max_scores.cpu().numpy()
+    base_labels, base_scores, base_seconds = results["torch"]
+    labels, scores, seconds = results[backend]
+    deltas = np.abs(np.asarray(scores) - np.asarray(base_scores))
+    report = {
+        "backend": backend,
+        "rows": len(texts),
+        "label_agreement": float(np.mean([a == b for a, b in zip(base_labels, labels)])) if texts else 1.0,
+        "mean_score_delta": float(deltas.mean()) if texts else 0.0,
+        "max_score_delta": float(deltas.max()) if texts else 0.0,
+        "speedup": base_seconds / seconds if seconds else float("nan"),
+    }
+    report["passed"] = report["label_agreement"] >= min_agreement and report["mean_score_delta"] <= max_score_delta
 
+    print(f"\n=== Backend Parity: {backend} vs fp32 torch ({report['rows']} rows) ===")
+    print(f"Label agreement : {report['label_agreement']:.2%} (need {min_agreement:.0%})")
+    print(f"Score delta     : mean {report['mean_score_delta']:.4f} (max allowed {max_score_delta}), "
+          f"worst {report['max_score_delta']:.4f}")
+    print(f"Speedup         : {report['speedup']:.2f}x")
+    print("PASSED" if report["passed"] else "FAILED - keep the fp32 backend")
+    return report
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# One vector per taxonomy label to score texts against, blended from up to three sources:
+#   name         the short label itself ("Unclear Disability Insurance Procedures")
+#   description  a sentence on what belongs under it (data_add.taxonomy_label_mapping)
+#   exemplars    the centroid of real texts mapped to that label (by default the errors
+#                label_sub_topics mapped to a parent category, see LABEL_EXEMPLARS_PATH)
+# Each source is unit-normalized, weighted (weights of missing sources are spread over the
+# others) and the sum normalized again. A label without description or exemplars ends up
+# as its plain name embedding.
+#
+#   data/processed/prototypes/<model>/<version>.npy    (n_labels, dim) float32
+#   data/processed/prototypes/<model>/<version>.json   labels and weights, for inspection
+#
+# version hashes everything the matrix depends on, so a changed label, description,
+# exemplar, weight or model builds a new file and an unchanged taxonomy is one np.load.
+
+PROTOTYPE_STORE_PATH = os.path.join("data", "processed", "prototypes")
+# label_sub_topics' output: one row per LLM-found error, "Error" mapped to its "Parent Label"
+LABEL_EXEMPLARS_PATH = "my_findings.csv"
+
+DEFAULT_WEIGHTS = {"name": 0.4, "description": 0.3, "exemplars": 0.3}
+
+
+def _unit(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-8)
+
+
+def prototype_version(model_name, labels, descriptions=None, exemplars=None, weights=DEFAULT_WEIGHTS):
+    """
+    Short hash of everything the prototype matrix depends on.
+    """
+    descriptions = descriptions or {}
+    exemplars = exemplars or {}
+    payload = {
+        "model_name": model_name,
+        "labels": list(labels),
+        "descriptions": [descriptions.get(label) for label in labels],
+        "exemplars": [list(exemplars.get(label, [])) for label in labels],
+        "weights": weights,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def build_prototypes(encode, labels, descriptions=None, exemplars=None, weights=DEFAULT_WEIGHTS):
+    """
+    (len(labels), dim) float32 unit prototypes. encode(list of str) -> array is called once,
+    with every name, description and exemplar together.
+    """
+    labels = list(labels)
+    descriptions = descriptions or {}
+    exemplars = exemplars or {}
+
+    texts, owners, sources = [], [], []
+    for i, label in enumerate(labels):
+        texts.append(label)
+        owners.append(i)
+        sources.append("name")
+        if descriptions.get(label):
+            texts.append(descriptions[label])
+            owners.append(i)
+            sources.append("description")
+        for example in exemplars.get(label, []):
+            texts.append(example)
+            owners.append(i)
+            sources.append("exemplars")
+
+    vectors = _unit(encode(texts))
+    owners, sources = np.asarray(owners), np.asarray(sources)
+    blended = np.zeros((len(labels), vectors.shape[1]), dtype=np.float32)
+    total_weight = np.zeros(len(labels), dtype=np.float32)
+    for source, weight in weights.items():
+        mask = sources == source
+        if not mask.any():
+            continue
+        # mean of the source's unit vectors per label (the exemplar centroid), then unit again
+        sums = np.zeros_like(blended)
+        np.add.at(sums, owners[mask], vectors[mask])
+        present = np.bincount(owners[mask], minlength=len(labels)) > 0
+        blended[present] += weight * _unit(sums[present])
+        total_weight[present] += weight
+    return _unit(blended / np.maximum(total_weight, 1e-8)[:, None])
+
+
+def load_or_build_prototypes(encode, store_name, labels, descriptions=None, exemplars=None,
+                             weights=DEFAULT_WEIGHTS, root=PROTOTYPE_STORE_PATH):
+    """
+    The persisted prototype matrix for this exact taxonomy, built (and saved) only when
+    its version isn't on disk yet. root=None never touches the disk.
+    """
+    version = prototype_version(store_name, labels, descriptions, exemplars, weights)
+    if root is None:
+        return build_prototypes(encode, labels, descriptions, exemplars, weights), version
+
+    path = os.path.join(root, store_name.replace("/", "__"))
+    matrix_path = os.path.join(path, f"{version}.npy")
+    if os.path.exists(matrix_path):
+        return np.load(matrix_path), version
+
+    prototypes = build_prototypes(encode, labels, descriptions, exemplars, weights)
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, f"{version}.json"), "w", encoding="utf-8") as f:
+        json.dump({"labels": list(labels), "weights": weights,
+                   "exemplars": {label: len(exemplars.get(label, [])) for label in labels} if exemplars else {}}, f)
+    # saved under a temporary name and swapped in, a half written matrix is never loaded
+    tmp_path = matrix_path + ".tmp.npy"
+    np.save(tmp_path, prototypes)
+    os.replace(tmp_path, matrix_path)
+    print(f"Built {len(labels)} label prototypes ({version}) for {store_name}")
+    return prototypes, version
+
+
+def load_exemplars(path=LABEL_EXEMPLARS_PATH, label_column="Parent Label", text_column="Error", per_label=25,
+                   seed=0):
+    """
+    {label: [example texts]} from a CSV of texts mapped to labels (label_sub_topics' output
+    by default, any CSV of hand-checked examples works with the column names passed),
+    at most per_label per label, sampled with a fixed seed so the prototype version only
+    changes when the file does. {} when there's no file. Callers keep the labels of their
+    own taxonomy, the rest is ignored.
+    """
+    if not os.path.exists(path):
+        return {}
+    df = pd.read_csv(path, usecols=[label_column, text_column]).dropna()
+    df[text_column] = df[text_column].astype(str).str.strip()
+    df = df[df[text_column] != ""].drop_duplicates()
+    sampled = df.sample(frac=1, random_state=seed).groupby(label_column).head(per_label)
+    return {label: group[text_column].tolist() for label, group in sampled.groupby(label_column)}
@@ -0,0 +1,80 @@
+import numpy as np
+
+# Token-budget batching for model.encode. Knowledge_Answer runs from a few words to
+# multi-paragraph KB answers, and a fixed batch of 32 pads every text up to the longest
+# one in its batch. Here texts are sorted by token length (longest first, so an
+# out-of-memory batch shows up right away) and cut into batches whose padded size,
+# rows * longest row, stays under max_tokens: many short texts per batch, few long ones.
+# Embeddings come back in the original order.
+
+DEFAULT_MAX_BATCH_TOKENS = 16384
+
+
+def token_lengths(model, texts):
+    """
+    Tokens per text as the model will see them (special tokens included, cut at
+    max_seq_length). Falls back to a word count for models without a tokenizer.
+    """
+    max_length = getattr(model, "max_seq_length", None) or 512
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is None:
+        return np.minimum([len(text.split()) + 2 for text in texts], max_length).astype(np.int64)
+    input_ids = tokenizer(list(texts), add_special_tokens=True, truncation=True, max_length=max_length)["input_ids"]
+    return np.fromiter((len(ids) for ids in input_ids), dtype=np.int64, count=len(input_ids))
+
+
+def token_budget_batches(lengths, max_tokens=DEFAULT_MAX_BATCH_TOKENS):
+    """
+    Index arrays into lengths, longest texts first, each batch padding to at most
+    max_tokens (a single text longer than that gets a batch of its own).
+    """
+    lengths = np.asarray(lengths)
+    order = np.argsort(-lengths, kind="stable")
+    batches, start = [], 0
+    while start < len(order):
+        # sorted longest first, so the first row sets the padded width of the batch
+        size = max(1, max_tokens // max(1, int(lengths[order[start]])))
+        batches.append(order[start:start + size])
+        start += size
+    return batches
+
+
+def fixed_batches(n_texts, batch_size=32):
+    """
+    Arrival-order batches of batch_size, what encoding without bucketing does.
+    """
+    return [np.arange(start, min(start + batch_size, n_texts)) for start in range(0, n_texts, batch_size)]
+
+
+def padding_efficiency(lengths, batches):
+    """
+    Share of the encoded tokens that are real tokens rather than padding.
+    """
+    lengths = np.asarray(lengths)
+    padded = sum(len(batch) * int(lengths[batch].max()) for batch in batches if len(batch))
+    return float(lengths.sum() / padded) if padded else 1.0
+
+
+def encode_bucketed(model, texts, max_tokens=DEFAULT_MAX_BATCH_TOKENS, lengths=None):
+    """
+    float32 embeddings for texts, in order, encoded in token-budget batches.
+    """
+    texts = list(texts)
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    if lengths is None:
+        lengths = token_lengths(model, texts)
+    batches = token_budget_batches(lengths, max_tokens)
+
+    embeddings = None
+    for batch in batches:
+        vectors = model.encode(
+            [texts[i] for i in batch], batch_size=len(batch), convert_to_numpy=True, show_progress_bar=False
+        )
+        if embeddings is None:
+            embeddings = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+        embeddings[batch] = vectors
+
+    print(f"Encoded {len(texts)} texts in {len(batches)} batches of <= {max_tokens} tokens "
+          f"(padding efficiency {padding_efficiency(lengths, batches):.1%})")
+    return embeddings
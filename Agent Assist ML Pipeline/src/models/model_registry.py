@@ -0,0 +1,126 @@
+import gc
+import sys
+import threading
+import time
+from src.lazy import lazy_import
+
+sentence_transformers = lazy_import("sentence_transformers")
+torch = lazy_import("torch")
+
+# One loaded SentenceTransformer per (model name, device, backend) for the whole process.
+# Every TaxonomyLabeler asks the registry for its encoder, so building several labelers
+# (notebooks, main.py flows, one per taxonomy) never loads the same weights twice.
+#
+# Backends, for CPU-only batch hosts:
+#   "torch" - the fp32 PyTorch model (default)
+#   "int8"  - the same model with its Linear layers dynamically quantized to int8 (CPU only)
+#   "onnx"  - sentence-transformers' ONNX Runtime backend (needs optimum + onnxruntime)
+#
+# Cross-encoders (for reranking) are kept here too, under the "cross-encoder" backend.
+
+BACKENDS = ("torch", "int8", "onnx")
+CROSS_ENCODER = "cross-encoder"
+
+_models = {}   # (model_name, device, backend) -> SentenceTransformer
+_stats = {}    # (model_name, device, backend) -> {"load_seconds", "param_bytes", "requests"}
+_lock = threading.Lock()
+
+
+def _tensor_bytes(value):
+    # dynamically quantized Linear layers keep their weights as a packed (weight, bias)
+    # tuple in the state_dict rather than as parameters
+    if isinstance(value, (tuple, list)):
+        return sum(_tensor_bytes(item) for item in value)
+    if value is not None and hasattr(value, "element_size"):
+        return value.numel() * value.element_size()
+    return 0
+
+
+def _param_bytes(model):
+    """
+    Bytes of weights the model holds, counted over its state_dict so packed int8
+    weights are included.
+    """
+    # a CrossEncoder keeps its transformer in .model
+    module = model if hasattr(model, "state_dict") else getattr(model, "model", model)
+    try:
+        return sum(_tensor_bytes(value) for value in module.state_dict(keep_vars=False).values())
+    except (AttributeError, TypeError):
+        pass
+    try:
+        return sum(p.numel() * p.element_size() for p in module.parameters())
+    except AttributeError:
+        return 0
+
+
+def _load(model_name, device, backend):
+    if backend == "torch":
+        return sentence_transformers.SentenceTransformer(model_name, device=device)
+    if backend == "int8":
+        model = sentence_transformers.SentenceTransformer(model_name, device="cpu")
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if backend == "onnx":
+        return sentence_transformers.SentenceTransformer(model_name, device=device, backend="onnx")
+    if backend == CROSS_ENCODER:
+        return sentence_transformers.CrossEncoder(model_name, device=device)
+    raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS + (CROSS_ENCODER,)}")
+
+
+def get_model(model_name, device=None, backend="torch"):
+    """
+    The shared encoder for model_name on device (None = SentenceTransformer's default)
+    with the given backend, loaded on first request.
+    """
+    key = (model_name, device, backend)
+    with _lock:
+        if key not in _models:
+            start = time.perf_counter()
+            model = _load(model_name, device, backend)
+            load_seconds = time.perf_counter() - start
+            _models[key] = model
+            _stats[key] = {"load_seconds": load_seconds, "param_bytes": _param_bytes(model), "requests": 0}
+            print(f"Loaded {model_name} ({backend}) on {getattr(model, 'device', device)} in {load_seconds:.1f}s "
+                  f"({_stats[key]['param_bytes'] / 1e6:.0f} MB of weights)")
+        _stats[key]["requests"] += 1
+        return _models[key]
+
+
+def warm_up(model_names, device=None, backend="torch"):
+    """
+    Loads the models up front (e.g. before timing a run or forking workers).
+    """
+    for model_name in model_names:
+        get_model(model_name, device, backend)
+
+
+def unload(model_name=None, device=None, backend="torch"):
+    """
+    Drops models from the registry, all of them when model_name is None. Labelers still
+    holding a reference keep theirs alive until they go away.
+    """
+    with _lock:
+        keys = [key for key in _models if model_name is None or key == (model_name, device, backend)]
+        for key in keys:
+            del _models[key]
+            _stats.pop(key, None)
+    gc.collect()
+    if keys and "torch" in sys.modules and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    return len(keys)
+
+
+def registry_stats():
+    """
+    {(model_name, device, backend): {"load_seconds", "param_bytes", "requests"}} for the loaded models.
+    """
+    with _lock:
+        return {key: dict(stats) for key, stats in _stats.items()}
+
+
+def print_registry_stats():
+    print("\n=== Model Registry ===")
+    if not _stats:
+        print("No models loaded")
+    for (model_name, device, backend), stats in registry_stats().items():
+        print(f"{model_name} [{device or 'default'}, {backend}]: loaded in {stats['load_seconds']:.1f}s, "
+              f"{stats['param_bytes'] / 1e6:.0f} MB of weights, {stats['requests']} requests")
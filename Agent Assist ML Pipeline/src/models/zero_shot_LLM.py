@@ -1,5 +1,7 @@
 import time
-from openai import OpenAI
+from src.lazy import lazy_import
+
+openai = lazy_import("openai")
 
 def prompt_llm(prompts, system_prompt=None, examples=None):
     """
@@ -18,7 +20,7 @@ def prompt_llm(prompts, system_prompt=None, examples=None):
     
 
         
-    client = OpenAI(
+    client = openai.OpenAI(
         api_key="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",
         base_url="https://openrouter.ai/api/v1"
     )